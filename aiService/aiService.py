@@ -1,117 +1,416 @@
+import asyncio
 import json
+import logging
+from typing import Dict, List, Optional
 
-import openai
+import httpx
 
+from amazon.spec_parser import parse_weight
+from utils.metrics import instrumented_transport
+from utils.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATEGORY = {"prediction": "Everything Else"}
+DEFAULT_WEIGHT = {"weight_value": "no_weight", "weight_unit": "no_unit"}
+
+
+# Batch results hand back the DEFAULT_* objects themselves for items the model
+# could not answer, so callers can tell a fallback from a real answer.
+def is_fallback(result: dict) -> bool:
+    return result is DEFAULT_CATEGORY or result is DEFAULT_WEIGHT
+
+
+CATEGORIES = [
+    "Books",
+    "CDs, Cassettes, Vinyl",
+    "VHS Videotapes",
+    "DVDs and Blu-ray",
+    "Video Games",
+    "Software & Computer Games",
+    "Camera & Photo",
+    "Tools & Hardware",
+    "Kitchen & Housewares",
+    "Computer",
+    "Outdoor Living",
+    "Electronics",
+    "Sports & Outdoors",
+    "Cell Phones & Service",
+    "Musical Instruments",
+    "Office Products",
+    "Toy & Baby",
+    "Independent Design items",
+    "Everything Else",
+]
+WEIGHT_UNITS = ["g", "kg", "lb", "oz", "no_unit"]
+
+CATEGORY_PROPERTIES = {
+    "prediction": {
+        "type": "string",
+        "description": "The predicted product category.",
+        "enum": CATEGORIES,
+    }
+}
+WEIGHT_PROPERTIES = {
+    "weight_value": {
+        "type": "string",
+        "description": (
+            "The numeric weight value extracted, or 'no_weight' if not found"
+        ),
+    },
+    "weight_unit": {
+        "type": "string",
+        "description": ("The weight unit (g, kg, lb, oz) or 'no_unit' if not found"),
+        "enum": WEIGHT_UNITS,
+    },
+}
+
+CATEGORY_FUNCTION = {
+    "name": "fn_get_prediction_category",
+    "description": "Predict the correct category given the input text in Spanish or English. "
+    "Map to standard shipping categories.",
+    "parameters": {
+        "type": "object",
+        "properties": CATEGORY_PROPERTIES,
+        "required": ["prediction"],
+    },
+}
+WEIGHT_FUNCTION = {
+    "name": "fn_extract_weight",
+    "description": ("Extract weight value and unit from product dimensions if present"),
+    "parameters": {
+        "type": "object",
+        "properties": WEIGHT_PROPERTIES,
+        "required": ["weight_value", "weight_unit"],
+    },
+}
+
+
+def _batch_function(function: dict, description: str) -> dict:
+    return {
+        "name": f"{function['name']}_batch",
+        "description": description,
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "results": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "id": {"type": "string"},
+                            **function["parameters"]["properties"],
+                        },
+                        "required": ["id", *function["parameters"]["required"]],
+                    },
+                }
+            },
+            "required": ["results"],
+        },
+    }
+
+
+CATEGORY_BATCH_FUNCTION = _batch_function(
+    CATEGORY_FUNCTION,
+    "For each item, predict the correct category given its text in Spanish or "
+    "English. Map to standard shipping categories and echo back the item id.",
+)
+WEIGHT_BATCH_FUNCTION = _batch_function(
+    WEIGHT_FUNCTION,
+    "For each item, extract the weight value and unit from its product "
+    "specifications if present and echo back the item id.",
+)
 
-class AIClass:
-    def __init__(self, api_key: str, model: str):
-        if not api_key or len(api_key) == 0:
-            raise ValueError("OPENAI_KEY is missing")
 
-        self.openai = openai
-        self.openai.api_key = api_key
+class AIClass:
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        category_store=None,
+        weight_min_confidence: float = 0.7,
+        max_concurrency: int = 10,
+        timeout: float = 8.0,
+        max_connections: int = 20,
+    ):
+        self.api_key = api_key
         self.model = model
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._client = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.category_store = category_store
+        self.weight_min_confidence = weight_min_confidence
+        self._category_flight = SingleFlight()
+        self._weight_flight = SingleFlight()
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    # The SDK is slow to import and its client owns a connection pool, so
+    # both wait for the first call instead of happening at import (and before
+    # a fork).
+    @property
+    def client(self):
+        if self._client is None:
+            if not self.api_key:
+                raise ValueError("OPENAI_KEY is missing")
+            import openai
+
+            self._client = openai.AsyncOpenAI(
+                api_key=self.api_key,
+                http_client=httpx.AsyncClient(
+                    transport=instrumented_transport(
+                        "openai",
+                        limits=httpx.Limits(
+                            max_connections=self.max_connections,
+                            max_keepalive_connections=self.max_connections,
+                        ),
+                    ),
+                    timeout=httpx.Timeout(self.timeout),
+                ),
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    async def enrich(self, category: str, specifications: list) -> dict:
+        category_result, weight_result = await asyncio.gather(
+            self._with_timeout(
+                self.normalize_category_fn(category), DEFAULT_CATEGORY, "category"
+            ),
+            self._with_timeout(
+                self.extract_weight_fn(specifications), DEFAULT_WEIGHT, "weight"
+            ),
+        )
+        # Timeouts and errors hand back the DEFAULT_* objects themselves (or an
+        # empty prediction), so a real answer is never mistaken for one.
+        degraded = (
+            category_result is DEFAULT_CATEGORY
+            or not category_result.get("prediction")
+            or weight_result is DEFAULT_WEIGHT
+        )
+        if not category_result.get("prediction"):
+            category_result = DEFAULT_CATEGORY
+        return {
+            "category": category_result,
+            "weight": weight_result,
+            "degraded": degraded,
+        }
+
+    async def _with_timeout(self, coro, default: dict, name: str) -> dict:
+        try:
+            return await asyncio.wait_for(coro, self.timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"AI {name} enrichment timed out, using default")
+            return default
+
+    async def _create(self, **kwargs):
+        async with self._semaphore:
+            response = await self.client.chat.completions.create(**kwargs)
+        self.requests += 1
+        if response.usage is not None:
+            self.prompt_tokens += response.usage.prompt_tokens
+            self.completion_tokens += response.usage.completion_tokens
+        return response
+
+    def usage_stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+        }
+
+    def singleflight_stats(self) -> dict:
+        return {
+            "normalize_category": self._category_flight.stats(),
+            "extract_weight": self._weight_flight.stats(),
+        }
 
     async def normalize_category_fn(
         self, category: str, model: str = None, temperature: float = 0
+    ) -> dict:
+        if self.category_store is not None and category:
+            prediction = self.category_store.lookup(category)
+            if prediction:
+                return {"prediction": prediction}
+
+        key = json.dumps([category, model or self.model, temperature])
+        return await self._category_flight.do(
+            key, lambda: self._normalize_and_save(category, model, temperature)
+        )
+
+    async def extract_weight_fn(
+        self, specifications: list, model: str = None, temperature: float = 0
+    ) -> dict:
+        parsed = parse_weight(specifications)
+        if parsed["confidence"] >= self.weight_min_confidence:
+            return parsed
+
+        key = json.dumps(
+            [specifications, model or self.model, temperature], sort_keys=True
+        )
+        return await self._weight_flight.do(
+            key, lambda: self._extract_weight(specifications, model, temperature)
+        )
+
+    async def _normalize_and_save(
+        self, category: str, model: str = None, temperature: float = 0
+    ) -> dict:
+        # Runs inside the shared single-flight task, so the answer is saved
+        # even if the caller that started it timed out.
+        result = await self._normalize_category(category, model, temperature)
+        if self.category_store is not None and result.get("prediction"):
+            await self.category_store.save(category, result["prediction"])
+        return result
+
+    async def _normalize_category(
+        self, category: str, model: str = None, temperature: float = 0
     ) -> dict:
         try:
-            response = self.openai.chat.completions.create(
+            response = await self._create(
                 model=model or self.model,
                 temperature=temperature,
                 messages=[{"role": "user", "content": category}],
-                functions=[
-                    {
-                        "name": "fn_get_prediction_category",
-                        "description": "Predict the correct category given the input text in Spanish or English. "
-                        "Map to standard shipping categories.",
-                        "parameters": {
-                            "type": "object",
-                            "properties": {
-                                "prediction": {
-                                    "type": "string",
-                                    "description": "The predicted product category.",
-                                    "enum": [
-                                        "Books",
-                                        "CDs, Cassettes, Vinyl",
-                                        "VHS Videotapes",
-                                        "DVDs and Blu-ray",
-                                        "Video Games",
-                                        "Software & Computer Games",
-                                        "Camera & Photo",
-                                        "Tools & Hardware",
-                                        "Kitchen & Housewares",
-                                        "Computer",
-                                        "Outdoor Living",
-                                        "Electronics",
-                                        "Sports & Outdoors",
-                                        "Cell Phones & Service",
-                                        "Musical Instruments",
-                                        "Office Products",
-                                        "Toy & Baby",
-                                        "Independent Design items",
-                                        "Everything Else",
-                                    ],
-                                }
-                            },
-                            "required": ["prediction"],
-                        },
-                    }
-                ],
-                function_call={"name": "fn_get_prediction_category"},
+                functions=[CATEGORY_FUNCTION],
+                function_call={"name": CATEGORY_FUNCTION["name"]},
             )
             function_call = response.choices[0].message.function_call
             arguments = function_call.arguments
-            prediction = json.loads(arguments)
-            print(prediction)
-            return prediction
+            return json.loads(arguments)
         except Exception as e:
-            print(e)
+            logger.warning(f"Error normalizing category: {e}")
             return {"prediction": ""}
 
-    async def extract_weight_fn(
+    async def _extract_weight(
         self, specifications: list, model: str = None, temperature: float = 0
     ) -> dict:
         try:
-            response = self.openai.chat.completions.create(
+            response = await self._create(
                 model=model or self.model,
                 temperature=temperature,
                 messages=[{"role": "user", "content": str(specifications)}],
-                functions=[
-                    {
-                        "name": "fn_extract_weight",
-                        "description": (
-                            "Extract weight value and unit from product dimensions if present"
-                        ),
-                        "parameters": {
-                            "type": "object",
-                            "properties": {
-                                "weight_value": {
-                                    "type": "string",
-                                    "description": (
-                                        "The numeric weight value extracted, or 'no_weight' if not found"
-                                    ),
-                                },
-                                "weight_unit": {
-                                    "type": "string",
-                                    "description": (
-                                        "The weight unit (g, kg, lb, oz) or 'no_unit' if not found"
-                                    ),
-                                    "enum": ["g", "kg", "lb", "oz", "no_unit"],
-                                },
-                            },
-                            "required": ["weight_value", "weight_unit"],
-                        },
-                    }
-                ],
-                function_call={"name": "fn_extract_weight"},
+                functions=[WEIGHT_FUNCTION],
+                function_call={"name": WEIGHT_FUNCTION["name"]},
             )
 
             function_call = response.choices[0].message.function_call
             arguments = function_call.arguments
-            prediction = json.loads(arguments)
-            print(prediction)
-            return prediction
+            return json.loads(arguments)
+        except Exception as e:
+            logger.warning(f"Error extracting weight: {e}")
+            return DEFAULT_WEIGHT
+
+    async def normalize_categories_batch(
+        self, items: List[dict], model: str = None, batch_size: int = 25
+    ) -> Dict[str, dict]:
+        results = {}
+        pending = []
+        for item in items:
+            prediction = None
+            if self.category_store is not None and item["category"]:
+                prediction = self.category_store.lookup(item["category"])
+            if prediction:
+                results[str(item["id"])] = {"prediction": prediction}
+            else:
+                pending.append(item)
+
+        chunks = [
+            pending[i : i + batch_size] for i in range(0, len(pending), batch_size)
+        ]
+        for chunk_results in await asyncio.gather(
+            *[self._normalize_categories_chunk(chunk, model) for chunk in chunks]
+        ):
+            results.update(chunk_results)
+        return results
+
+    async def extract_weights_batch(
+        self, items: List[dict], model: str = None, batch_size: int = 25
+    ) -> Dict[str, dict]:
+        results = {}
+        pending = []
+        for item in items:
+            parsed = parse_weight(item["specifications"])
+            if parsed["confidence"] >= self.weight_min_confidence:
+                results[str(item["id"])] = parsed
+            else:
+                pending.append(item)
+
+        chunks = [
+            pending[i : i + batch_size] for i in range(0, len(pending), batch_size)
+        ]
+        for chunk_results in await asyncio.gather(
+            *[self._extract_weights_chunk(chunk, model) for chunk in chunks]
+        ):
+            results.update(chunk_results)
+        return results
+
+    async def _normalize_categories_chunk(
+        self, items: List[dict], model: str = None
+    ) -> Dict[str, dict]:
+        content = [
+            {"id": str(item["id"]), "category": item["category"]} for item in items
+        ]
+        predictions = await self._batch_call(content, CATEGORY_BATCH_FUNCTION, model)
+        if predictions is None:
+            # The whole call failed; retrying each item would only repeat it.
+            return {str(item["id"]): DEFAULT_CATEGORY for item in items}
+        results = {}
+        for item in items:
+            item_id = str(item["id"])
+            prediction = predictions.get(item_id, {}).get("prediction")
+            if prediction in CATEGORIES:
+                results[item_id] = {"prediction": prediction}
+                if self.category_store is not None and item["category"]:
+                    await self.category_store.save(item["category"], prediction)
+            else:
+                # Missing or invalid entries are retried one by one.
+                result = await self.normalize_category_fn(item["category"])
+                results[item_id] = (
+                    result if result.get("prediction") else DEFAULT_CATEGORY
+                )
+        return results
+
+    async def _extract_weights_chunk(
+        self, items: List[dict], model: str = None
+    ) -> Dict[str, dict]:
+        content = [
+            {"id": str(item["id"]), "specifications": item["specifications"]}
+            for item in items
+        ]
+        predictions = await self._batch_call(content, WEIGHT_BATCH_FUNCTION, model)
+        if predictions is None:
+            return {str(item["id"]): DEFAULT_WEIGHT for item in items}
+        results = {}
+        for item in items:
+            item_id = str(item["id"])
+            prediction = predictions.get(item_id)
+            if prediction and prediction.get("weight_unit") in WEIGHT_UNITS:
+                results[item_id] = {
+                    "weight_value": prediction.get("weight_value", "no_weight"),
+                    "weight_unit": prediction["weight_unit"],
+                }
+            else:
+                results[item_id] = await self._extract_weight(item["specifications"])
+        return results
+
+    # None when the call itself failed, as opposed to answering some items.
+    async def _batch_call(
+        self, content: List[dict], function: dict, model: str = None
+    ) -> Optional[Dict[str, dict]]:
+        try:
+            response = await self._create(
+                model=model or self.model,
+                temperature=0,
+                messages=[{"role": "user", "content": json.dumps(content)}],
+                functions=[function],
+                function_call={"name": function["name"]},
+            )
+            arguments = json.loads(response.choices[0].message.function_call.arguments)
+            return {str(result.get("id")): result for result in arguments["results"]}
         except Exception as e:
-            print(e)
-            return {"weight_value": "no_weight", "weight_unit": "no_unit"}
+            logger.error(f"Error in batch call {function['name']}: {e}")
+            return None
@@ -0,0 +1,149 @@
+"""Backfill normalized_category, weight_lb and shipping_fee on old cart_items.
+
+Usage: python -m aiService.backfill [--chunk-size N] [--concurrency N] [--limit N]
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from collections import Counter
+
+from aiService.aiService import is_fallback
+from amazon.shippingFees import calculate_shipping_fee, convert_to_pounds
+
+logger = logging.getLogger(__name__)
+
+
+async def _backfill_chunk(client, ai_service, rows: list) -> dict:
+    categories, weights = await asyncio.gather(
+        ai_service.normalize_categories_batch(
+            [{"id": row["id"], "category": row.get("category")} for row in rows]
+        ),
+        ai_service.extract_weights_batch(
+            [
+                {"id": row["id"], "specifications": row.get("specifications")}
+                for row in rows
+            ]
+        ),
+    )
+
+    updates = []
+    for row in rows:
+        row_id = str(row["id"])
+        if is_fallback(categories[row_id]) or is_fallback(weights[row_id]):
+            # Left null so a later run asks the model again.
+            continue
+        normalized_category = categories[row_id]["prediction"]
+        weight = weights[row_id]
+        weight_lb = convert_to_pounds(weight["weight_value"], weight["weight_unit"])
+        updates.append(
+            {
+                "id": row["id"],
+                "normalized_category": normalized_category,
+                "weight_lb": weight_lb,
+                "shipping_fee": calculate_shipping_fee(normalized_category, weight_lb),
+            }
+        )
+    # One round trip per chunk. A PostgREST upsert of partial rows would
+    # trip the NOT NULL columns it leaves out, so this goes through an RPC.
+    skipped = len(rows) - len(updates)
+    if not updates:
+        return {"updated": 0, "skipped": skipped}
+    try:
+        response = await client.execute(
+            client.rpc("update_cart_enrichments", {"updates": updates})
+        )
+        return {"updated": response.data, "skipped": skipped}
+    except Exception as e:
+        ids = ", ".join(str(update["id"]) for update in updates)
+        logger.error(f"Error updating cart items {ids}: {e}")
+        return {"updated": 0, "skipped": skipped}
+
+
+async def backfill_cart_items(
+    client,
+    ai_service,
+    chunk_size: int = 50,
+    concurrency: int = 4,
+    limit: int = None,
+) -> dict:
+    if chunk_size < 1 or concurrency < 1 or (limit is not None and limit < 1):
+        raise ValueError("chunk_size, concurrency and limit must be at least 1")
+    started = time.perf_counter()
+    usage_before = ai_service.usage_stats()
+    selected = 0
+    totals = Counter()
+    last_id = None
+    pending = set()
+
+    while limit is None or selected < limit:
+        # Keep at most `concurrency` chunks in flight so only those pages are
+        # held in memory, whatever the size of the table.
+        if len(pending) >= concurrency:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                totals.update(task.result())
+        page_size = chunk_size if limit is None else min(chunk_size, limit - selected)
+        query = (
+            client.table("cart_items")
+            .select("id, category, specifications")
+            .or_("normalized_category.is.null,weight_lb.is.null")
+            .order("id")
+            .limit(page_size)
+        )
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        rows = (await client.execute(query)).data
+        if not rows:
+            break
+        selected += len(rows)
+        last_id = rows[-1]["id"]
+        pending.add(asyncio.create_task(_backfill_chunk(client, ai_service, rows)))
+
+    for result in await asyncio.gather(*pending):
+        totals.update(result)
+    elapsed = time.perf_counter() - started
+    usage_after = ai_service.usage_stats()
+    tokens = (
+        usage_after["prompt_tokens"]
+        + usage_after["completion_tokens"]
+        - usage_before["prompt_tokens"]
+        - usage_before["completion_tokens"]
+    )
+    return {
+        "items": selected,
+        "updated": totals["updated"],
+        # Items the model could not answer, left for a later run.
+        "skipped": totals["skipped"],
+        "seconds": round(elapsed, 3),
+        "items_per_second": round(selected / elapsed, 2) if elapsed else 0.0,
+        "llm_requests": usage_after["requests"] - usage_before["requests"],
+        "tokens_per_item": round(tokens / selected, 1) if selected else 0.0,
+    }
+
+
+async def _main(args):
+    # Imported here so the module can be used from main.py without a cycle.
+    from main import ai_service, category_store, get_db
+
+    db = get_db()
+    await category_store.load()
+    try:
+        report = await backfill_cart_items(
+            db, ai_service, args.chunk_size, args.concurrency, args.limit
+        )
+    finally:
+        await ai_service.aclose()
+        await db.aclose()
+    print(report)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunk-size", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--limit", type=int, default=None)
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,117 @@
+import logging
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Optional
+
+from utils.text import fold_text
+
+logger = logging.getLogger(__name__)
+
+STOPWORDS = {"and", "de", "del", "el", "en", "for", "la", "las", "los", "para", "y"}
+
+
+def _tokens(text: str) -> set:
+    return {
+        token
+        for token in re.split(r"[^\wñ]+", text)
+        if len(token) > 2 and token not in STOPWORDS
+    }
+
+
+class CategoryStore:
+    def __init__(
+        self,
+        client,
+        min_score: float = 0.8,
+        min_coverage: float = 0.5,
+        table: str = "category_mappings",
+    ):
+        self.client = client
+        self.min_score = min_score
+        self.min_coverage = min_coverage
+        self.table = table
+        self.exact_hits = 0
+        self.classifier_hits = 0
+        self.llm_calls = 0
+        self._mappings: Dict[str, str] = {}
+        self._token_counts: Dict[str, Counter] = defaultdict(Counter)
+
+    async def load(self):
+        try:
+            response = await self.client.execute(
+                self.client.table(self.table).select(
+                    "raw_category, normalized_category"
+                )
+            )
+        except Exception as e:
+            logger.error(f"Error loading category mappings: {e}")
+            return
+        for row in response.data:
+            self._add(fold_text(row["raw_category"]), row["normalized_category"])
+        logger.info(f"Loaded {len(self._mappings)} category mappings")
+
+    def lookup(self, category: str) -> Optional[str]:
+        key = fold_text(category)
+        prediction = self._mappings.get(key)
+        if prediction:
+            self.exact_hits += 1
+            return prediction
+
+        prediction = self._classify(key)
+        if prediction:
+            self.classifier_hits += 1
+        return prediction
+
+    async def save(self, category: str, prediction: str):
+        self.llm_calls += 1
+        key = fold_text(category)
+        if key in self._mappings:
+            return
+        self._add(key, prediction)
+        try:
+            await self.client.execute(
+                self.client.table(self.table).upsert(
+                    {"raw_category": key, "normalized_category": prediction}
+                )
+            )
+        except Exception as e:
+            logger.error(f"Error saving category mapping: {e}")
+
+    def stats(self) -> dict:
+        total = self.exact_hits + self.classifier_hits + self.llm_calls
+        return {
+            "mappings": len(self._mappings),
+            "exact_hits": self.exact_hits,
+            "classifier_hits": self.classifier_hits,
+            "llm_calls": self.llm_calls,
+            "exact_ratio": self.exact_hits / total if total else 0.0,
+            "classifier_ratio": self.classifier_hits / total if total else 0.0,
+            "llm_ratio": self.llm_calls / total if total else 0.0,
+        }
+
+    def _add(self, key: str, prediction: str):
+        self._mappings[key] = prediction
+        for token in _tokens(key):
+            self._token_counts[token][prediction] += 1
+
+    def _classify(self, key: str) -> Optional[str]:
+        # Each known token votes for the categories it was seen with, weighted
+        # by how often; the winner must hold min_score of the total vote and
+        # enough of the input must be made of known tokens.
+        tokens = _tokens(key)
+        votes = Counter()
+        known = 0
+        for token in tokens:
+            counts = self._token_counts.get(token)
+            if not counts:
+                continue
+            known += 1
+            total = sum(counts.values())
+            for prediction, count in counts.items():
+                votes[prediction] += count / total
+        if not votes or known / len(tokens) < self.min_coverage:
+            return None
+        prediction, score = votes.most_common(1)[0]
+        if score / sum(votes.values()) < self.min_score:
+            return None
+        return prediction
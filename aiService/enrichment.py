@@ -0,0 +1,112 @@
+import logging
+from collections import OrderedDict
+from typing import List, Optional
+
+from amazon.shippingFees import convert_to_pounds
+from utils.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class EnrichmentStore:
+    def __init__(
+        self,
+        client,
+        ai_service,
+        max_entries: int = 10000,
+        table: str = "product_enrichments",
+    ):
+        self.client = client
+        self.ai_service = ai_service
+        self.max_entries = max_entries
+        self.table = table
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._flight = SingleFlight()
+
+    async def get(self, asin: str) -> Optional[dict]:
+        if asin in self._entries:
+            self._entries.move_to_end(asin)
+            return self._entries[asin]
+
+        try:
+            response = await self.client.execute(
+                self.client.table(self.table)
+                .select("normalized_category, weight_lb")
+                .eq("asin", asin)
+            )
+        except Exception as e:
+            logger.error(f"Error reading enrichment for {asin}: {e}")
+            return None
+        if not response.data:
+            return None
+        row = response.data[0]
+        enrichment = {
+            "normalized_category": row["normalized_category"],
+            "weight_lb": float(row["weight_lb"]),
+        }
+        self._remember(asin, enrichment)
+        return enrichment
+
+    async def get_or_enrich(
+        self, asins: List[Optional[str]], category: str, specifications: list
+    ) -> dict:
+        asins = [asin for asin in asins if asin]
+        if not asins:
+            # Nothing to key the result by, so it is not stored.
+            enrichment, _ = await self._compute(category, specifications)
+            return enrichment
+        # A variant's own specifications decide its weight; the parent's row
+        # only stands in when the request carries none.
+        for asin in asins if not specifications else asins[:1]:
+            enrichment = await self.get(asin)
+            if enrichment:
+                return enrichment
+        return await self.enrich(asins[0], category, specifications)
+
+    async def enrich(self, asin: str, category: str, specifications: list) -> dict:
+        return await self._flight.do(
+            asin, lambda: self._enrich(asin, category, specifications)
+        )
+
+    async def enrich_product(self, product):
+        try:
+            if await self.get(product.asin) is None:
+                await self.enrich(
+                    product.asin, product.category, product.specifications
+                )
+        except Exception as e:
+            logger.error(f"Error enriching product {product.asin}: {e}")
+
+    # Only the category and weight are kept; the shipping fee depends on the
+    # rate table in effect and is priced by the caller.
+    async def _compute(self, category: str, specifications: list):
+        result = await self.ai_service.enrich(category, specifications)
+        enrichment = {
+            "normalized_category": result["category"]["prediction"],
+            "weight_lb": convert_to_pounds(
+                result["weight"]["weight_value"], result["weight"]["weight_unit"]
+            ),
+        }
+        return enrichment, bool(result.get("degraded"))
+
+    async def _enrich(self, asin: str, category: str, specifications: list) -> dict:
+        enrichment, degraded = await self._compute(category, specifications)
+        if degraded:
+            # A fallback answer is good enough for this request but must not
+            # outlive it; the next lookup asks the model again.
+            logger.warning(f"Not saving fallback enrichment for {asin}")
+            return enrichment
+        try:
+            await self.client.execute(
+                self.client.table(self.table).upsert({"asin": asin, **enrichment})
+            )
+        except Exception as e:
+            logger.error(f"Error saving enrichment for {asin}: {e}")
+        self._remember(asin, enrichment)
+        return enrichment
+
+    def _remember(self, asin: str, enrichment: dict):
+        self._entries[asin] = enrichment
+        self._entries.move_to_end(asin)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -1,8 +1,10 @@
-import os
+from typing import Optional
 
-import requests
-from dotenv import load_dotenv
+import httpx
 
+from amazon.cache import TTLCache, build_cache
+from amazon.query import QueryFrequency, SearchWarmer, normalize_query
+from config import settings
 from schemas.schemas import (
     Product,
     ProductDetail,
@@ -10,25 +12,143 @@ from schemas.schemas import (
     ProductPrice,
     SearchResponse,
 )
+from utils.metrics import instrumented_transport
+from utils.singleflight import SingleFlight
 
-load_dotenv()
+_client: Optional[httpx.AsyncClient] = None
+_product_cache: Optional[TTLCache] = None
+_search_cache: Optional[TTLCache] = None
+_search_warmer: Optional[SearchWarmer] = None
+_query_frequency = QueryFrequency(settings.search_frequency_window)
+_search_flight = SingleFlight()
+_details_flight = SingleFlight()
 
-API_KEY: str = os.environ["API_KEY"]
-API_URL: str = os.environ["API_URL"]
 
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
 
-def search_products(query: str) -> SearchResponse:
+
+async def open_client() -> httpx.AsyncClient:
+    global _client, _product_cache, _search_cache, _search_warmer
+    if _product_cache is None:
+        _product_cache = build_cache(
+            settings.product_cache_backend,
+            "product",
+            settings.product_cache_ttl,
+            settings.product_cache_stale_ttl,
+            settings.product_cache_max_bytes,
+            settings.redis_url,
+        )
+    if _search_cache is None:
+        _search_cache = build_cache(
+            settings.search_cache_backend,
+            "search",
+            settings.search_cache_ttl,
+            settings.search_cache_stale_ttl,
+            settings.search_cache_max_bytes,
+            settings.redis_url,
+        )
+        if _search_cache is not None:
+            _search_warmer = SearchWarmer(
+                _search_cache,
+                _query_frequency,
+                _fetch_search_dump,
+                settings.search_warm_top_n,
+                settings.search_warm_interval,
+            )
+            _search_warmer.start()
+    if _client is None:
+        _client = httpx.AsyncClient(
+            transport=instrumented_transport(
+                "amazon",
+                http2=settings.amazon_api_http2 and _http2_available(),
+                limits=httpx.Limits(
+                    max_connections=settings.amazon_api_max_connections,
+                    max_keepalive_connections=settings.amazon_api_max_keepalive,
+                    keepalive_expiry=settings.amazon_api_keepalive_expiry,
+                ),
+            ),
+            timeout=httpx.Timeout(settings.amazon_api_timeout),
+        )
+    return _client
+
+
+async def close_client():
+    global _client, _product_cache, _search_cache, _search_warmer
+    if _search_warmer is not None:
+        await _search_warmer.stop()
+        _search_warmer = None
+    if _search_cache is not None:
+        await _search_cache.close()
+        _search_cache = None
+    if _product_cache is not None:
+        await _product_cache.close()
+        _product_cache = None
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def cache_stats() -> dict:
+    return {
+        "product": await _product_cache.stats() if _product_cache else None,
+        "search": await _search_cache.stats() if _search_cache else None,
+        "search_warmed": _search_warmer.warmed if _search_warmer else 0,
+    }
+
+
+async def _get(params: dict) -> dict:
+    client = _client or await open_client()
+    response = await client.get(settings.api_url, params=params)
+    response.raise_for_status()
+    return response.json()
+
+
+def singleflight_stats() -> dict:
+    return {
+        "search": _search_flight.stats(),
+        "product_details": _details_flight.stats(),
+    }
+
+
+async def search_products(query: str) -> SearchResponse:
+    return SearchResponse.model_validate(await search_products_dump(query))
+
+
+# The SearchResponse as a plain dict, straight from the cache when possible,
+# for callers that serialize it themselves.
+async def search_products_dump(query: str) -> dict:
+    key = normalize_query(query)
+    # Frequencies only feed the warmer; don't track queries nobody reads.
+    if _search_warmer is not None and _search_warmer.top_n > 0:
+        _query_frequency.record(key, query)
+    if _search_cache is None:
+        return await _fetch_search_dump(key, query)
+
+    async def fetch():
+        return await _fetch_search_dump(key, query)
+
+    return await _search_cache.get_or_fetch(key, fetch)
+
+
+async def _fetch_search_dump(key: str, query: str) -> dict:
+    response = await _search_flight.do(key, lambda: _fetch_search(query))
+    return response.model_dump()
+
+
+async def _fetch_search(query: str) -> SearchResponse:
     params = {
-        "api_key": API_KEY,
+        "api_key": settings.api_key,
         "engine": "amazon_search",
-        "q": query,
+        "q": " ".join(query.split()),
         "amazon_domain": "amazon.com.mx",
     }
 
-    response = requests.get(API_URL, params=params)
-    response.raise_for_status()
-
-    data = response.json()
+    data = await _get(params)
 
     products = []
     shopping_results = data.get("shopping_results", [])
@@ -71,19 +191,31 @@ def search_products(query: str) -> SearchResponse:
     return SearchResponse(products=products)
 
 
-def get_product_details(asin: str) -> ProductDetailResponse:
+async def get_product_details(asin: str) -> ProductDetailResponse:
+    if _product_cache is None:
+        return await _details_flight.do(asin, lambda: _fetch_product_details(asin))
+
+    async def fetch():
+        return await _details_flight.do(asin, lambda: _fetch_product_dump(asin))
+
+    return ProductDetailResponse.model_validate(
+        await _product_cache.get_or_fetch(asin, fetch)
+    )
+
+
+async def _fetch_product_dump(asin: str) -> dict:
+    return (await _fetch_product_details(asin)).model_dump()
+
+
+async def _fetch_product_details(asin: str) -> ProductDetailResponse:
     params = {
-        "api_key": API_KEY,
+        "api_key": settings.api_key,
         "engine": "amazon_product",
         "asin": asin,
         "amazon_domain": "amazon.com.mx",
     }
 
-    response = requests.get(API_URL, params=params)
-    response.raise_for_status()
-
-    data = response.json()
-    print("API Response:", data)
+    data = await _get(params)
     product_data = data.get("product", {})
 
     product_detail = ProductDetail(
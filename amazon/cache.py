@@ -0,0 +1,206 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        if len(value) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    async def delete(self, key: str):
+        if key in self._entries:
+            self._remove(key)
+
+    async def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
+
+    async def close(self):
+        self._entries.clear()
+        self.size = 0
+
+    def _remove(self, key: str):
+        value, _ = self._entries.pop(key)
+        self.size -= len(value)
+
+
+class RedisBackend:
+    # Byte cap and LRU eviction are delegated to the server
+    # (maxmemory + maxmemory-policy allkeys-lru).
+    # `client` replaces the connection built from `url`, e.g. with a fakeredis
+    # instance in benchmarks.
+    def __init__(self, url: str, namespace: str, client=None):
+        self.namespace = namespace
+        if client is not None:
+            self._redis = client
+            return
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise ValueError("The redis package is required for the redis cache")
+
+        self._redis = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._redis.get(f"{self.namespace}:{key}")
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        await self._redis.set(f"{self.namespace}:{key}", value, px=int(ttl * 1000))
+
+    async def delete(self, key: str):
+        await self._redis.delete(f"{self.namespace}:{key}")
+
+    async def stats(self) -> dict:
+        try:
+            info = await self._redis.info("stats")
+            memory = await self._redis.info("memory")
+        except Exception as e:
+            # Some Redis-protocol servers do not implement INFO.
+            logger.warning(f"Error reading redis stats: {e}")
+            return {"backend": "redis"}
+        return {
+            "backend": "redis",
+            "bytes": memory.get("used_memory"),
+            "max_bytes": memory.get("maxmemory"),
+            "evictions": info.get("evicted_keys", 0),
+        }
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+class TTLCache:
+    def __init__(self, backend, ttl: float, stale_ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self._refreshing: Dict[str, asyncio.Task] = {}
+
+    async def get_or_fetch(
+        self, key: str, fetch: Callable[[], Awaitable[dict]], ttl: float = None
+    ) -> dict:
+        raw = await self.backend.get(key)
+        if raw is not None:
+            entry = json.loads(raw)
+            if entry["fresh_until"] > time.time():
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+                self._refresh(key, fetch, ttl)
+            return entry["value"]
+
+        self.misses += 1
+        value = await fetch()
+        await self.set(key, value, ttl)
+        return value
+
+    async def get(self, key: str) -> Optional[dict]:
+        raw = await self.backend.get(key)
+        if raw is None:
+            return None
+        return json.loads(raw)["value"]
+
+    async def is_fresh(self, key: str) -> bool:
+        raw = await self.backend.get(key)
+        return raw is not None and json.loads(raw)["fresh_until"] > time.time()
+
+    async def set(self, key: str, value: dict, ttl: float = None):
+        ttl = ttl or self.ttl
+        entry = {"fresh_until": time.time() + ttl, "value": value}
+        await self.backend.set(
+            key, json.dumps(entry).encode("utf-8"), ttl + self.stale_ttl
+        )
+
+    async def delete(self, key: str):
+        await self.backend.delete(key)
+
+    async def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "hit_ratio": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            **await self.backend.stats(),
+        }
+
+    async def close(self):
+        for task in self._refreshing.values():
+            task.cancel()
+        self._refreshing.clear()
+        await self.backend.close()
+
+    def _refresh(self, key: str, fetch: Callable[[], Awaitable[dict]], ttl: float):
+        if key in self._refreshing:
+            return
+
+        async def refresh():
+            try:
+                await self.set(key, await fetch(), ttl)
+                self.refreshes += 1
+            except Exception as e:
+                logger.warning(f"Error refreshing cache entry {key}: {e}")
+            finally:
+                self._refreshing.pop(key, None)
+
+        self._refreshing[key] = asyncio.create_task(refresh())
+
+
+def build_cache(
+    kind: str,
+    namespace: str,
+    ttl: float,
+    stale_ttl: float,
+    max_bytes: int,
+    redis_url: str = None,
+) -> Optional[TTLCache]:
+    if kind == "none":
+        return None
+    if kind == "memory":
+        return TTLCache(MemoryBackend(max_bytes), ttl, stale_ttl)
+    if kind == "redis":
+        if not redis_url:
+            raise ValueError("REDIS_URL is required for the redis cache")
+        return TTLCache(RedisBackend(redis_url, namespace), ttl, stale_ttl)
+    raise ValueError(f"Unknown cache backend: {kind}")
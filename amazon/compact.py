@@ -0,0 +1,76 @@
+import bisect
+import re
+from typing import List, Optional
+
+from schemas.schemas import Product
+
+PRODUCT_FIELDS = list(Product.model_fields)
+# What a result card needs; used when a compact response asks for no fields.
+COMPACT_PRODUCT_FIELDS = [
+    "asin",
+    "title",
+    "price",
+    "image",
+    "rating",
+    "ratings_total",
+    "is_prime",
+]
+# Rewritten thumbnails snap to these widths so the CDN sees a handful of
+# variants per image instead of one per client screen size.
+IMAGE_SIZES = [160, 240, 320, 480, 640, 960, 1280]
+
+_IMAGE_HOSTS = re.compile(
+    r"^https?://(m\.media-amazon\.com|images-na\.ssl-images-amazon\.com)/images/"
+)
+# "71abc._AC_UL320_.jpg" or "71abc.jpg": an optional ._<modifiers>_ block
+# before the extension.
+_IMAGE_NAME = re.compile(r"^(?P<stem>[^/.]+)(?:\._[^/]*_)?\.(?P<ext>jpe?g|png|webp)$")
+
+
+def parse_product_fields(
+    fields: Optional[List[str]], compact: bool = False
+) -> Optional[List[str]]:
+    if not fields:
+        return COMPACT_PRODUCT_FIELDS if compact else None
+    unknown = set(fields) - set(PRODUCT_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return fields
+
+
+def snap_width(width: int) -> int:
+    index = bisect.bisect_left(IMAGE_SIZES, width)
+    return IMAGE_SIZES[min(index, len(IMAGE_SIZES) - 1)]
+
+
+def resize_image_url(url: str, width: int) -> str:
+    if not url or not _IMAGE_HOSTS.match(url):
+        return url
+    base, _, name = url.rpartition("/")
+    match = _IMAGE_NAME.match(name)
+    if match is None:
+        return url
+    return f"{base}/{match['stem']}._AC_UL{snap_width(width)}_.{match['ext']}"
+
+
+def compact_search(
+    dump: dict,
+    fields: Optional[List[str]] = None,
+    limit: Optional[int] = None,
+    width: Optional[int] = None,
+) -> dict:
+    products = dump["products"]
+    if limit is not None:
+        products = products[:limit]
+    if fields is None and width is None:
+        return {"products": products}
+    compacted = []
+    for product in products:
+        if fields is not None:
+            product = {field: product.get(field) for field in fields}
+        else:
+            product = dict(product)
+        if width is not None and product.get("image"):
+            product["image"] = resize_image_url(product["image"], width)
+        compacted.append(product)
+    return {"products": compacted}
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import time
+from collections import Counter, deque
+from typing import Awaitable, Callable, Deque, Dict, List, Tuple
+
+from utils.text import fold_text
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(sorted(fold_text(query).split()))
+
+
+class QueryFrequency:
+    def __init__(self, window_seconds: float, buckets: int = 12):
+        self.bucket_seconds = window_seconds / buckets
+        self._buckets: Deque[Tuple[float, Counter]] = deque(maxlen=buckets)
+        self._queries: Dict[str, str] = {}
+
+    def record(self, key: str, query: str):
+        now = time.time()
+        if not self._buckets or now - self._buckets[-1][0] >= self.bucket_seconds:
+            self._roll(now)
+        self._buckets[-1][1][key] += 1
+        self._queries[key] = query
+
+    # Start a new bucket, dropping the full or expired ones and the queries
+    # that were only seen in them, so _queries stays bounded by the window
+    # even if top() is never called.
+    def _roll(self, now: float):
+        cutoff = now - self.bucket_seconds * self._buckets.maxlen
+        dropped = Counter()
+        while self._buckets and (
+            len(self._buckets) == self._buckets.maxlen or self._buckets[0][0] < cutoff
+        ):
+            dropped.update(self._buckets.popleft()[1])
+        self._buckets.append((now, Counter()))
+        if dropped:
+            live = set().union(*(counts for _, counts in self._buckets))
+            for key in dropped:
+                if key not in live:
+                    self._queries.pop(key, None)
+
+    def top(self, n: int) -> List[Tuple[str, str]]:
+        cutoff = time.time() - self.bucket_seconds * self._buckets.maxlen
+        totals = Counter()
+        for started_at, counts in self._buckets:
+            if started_at >= cutoff:
+                totals.update(counts)
+        for key in list(self._queries):
+            if key not in totals:
+                del self._queries[key]
+        return [(key, self._queries[key]) for key, _ in totals.most_common(n)]
+
+
+class SearchWarmer:
+    def __init__(
+        self,
+        cache,
+        frequency: QueryFrequency,
+        fetch: Callable[[str, str], Awaitable[dict]],
+        top_n: int,
+        interval: float,
+    ):
+        self.cache = cache
+        self.frequency = frequency
+        self.fetch = fetch
+        self.top_n = top_n
+        self.interval = interval
+        self.warmed = 0
+        self._task = None
+
+    def start(self):
+        if self._task is None and self.top_n > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def warm(self):
+        for key, query in self.frequency.top(self.top_n):
+            if await self.cache.is_fresh(key):
+                continue
+            try:
+                await self.cache.set(key, await self.fetch(key, query))
+                self.warmed += 1
+            except Exception as e:
+                logger.warning(f"Error warming search query {query!r}: {e}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.warm()
@@ -0,0 +1,154 @@
+import glob
+import json
+import os
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import settings
+
+
+class RateTable:
+    def __init__(
+        self,
+        version: str,
+        effective_from: date,
+        categories: Dict[str, dict],
+        default_category: str,
+    ):
+        self.version = version
+        self.effective_from = effective_from
+        self.categories = list(categories)
+        self.index = {name: i for i, name in enumerate(self.categories)}
+        self.default_index = self.index[default_category]
+        self.base = np.array([categories[c]["base"] for c in self.categories])
+        self.per_pound = np.array([categories[c]["per_pound"] for c in self.categories])
+        # Plain floats for pricing a single item without numpy overhead.
+        self.rates = {
+            name: (float(rates["base"]), float(rates["per_pound"]))
+            for name, rates in categories.items()
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "RateTable":
+        return cls(
+            data["version"],
+            date.fromisoformat(data["effective_from"]),
+            data["categories"],
+            data["default_category"],
+        )
+
+    def category_indices(self, categories: Sequence[Optional[str]]) -> np.ndarray:
+        # Unknown or missing categories are priced as the default category.
+        return np.fromiter(
+            (self.index.get(c, self.default_index) for c in categories),
+            dtype=np.intp,
+            count=len(categories),
+        )
+
+    def unit_fees(
+        self, categories: Sequence[Optional[str]], weights_lb: np.ndarray
+    ) -> np.ndarray:
+        indices = self.category_indices(categories)
+        return self.base[indices] + self.per_pound[indices] * weights_lb
+
+    def quote(
+        self,
+        categories: Sequence[Optional[str]],
+        weights_lb: Sequence[float],
+        quantities: Sequence[int],
+    ) -> dict:
+        weights = np.asarray(weights_lb, dtype=float)
+        counts = np.asarray(quantities, dtype=float)
+        unit_fees = self.unit_fees(categories, weights)
+        fees = unit_fees * counts
+        return {
+            "unit_fees": np.round(unit_fees, 2).tolist(),
+            "fees": np.round(fees, 2).tolist(),
+            "total": round(float(fees.sum()), 2),
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "version": self.version,
+            "effective_from": self.effective_from.isoformat(),
+            "default_category": self.categories[self.default_index],
+            "categories": {
+                name: {"base": float(base), "per_pound": float(per_pound)}
+                for name, base, per_pound in zip(
+                    self.categories, self.base, self.per_pound
+                )
+            },
+        }
+
+
+def load_rate_tables(
+    directory: str = settings.shipping_rates_dir,
+) -> Dict[str, RateTable]:
+    tables = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        with open(path, encoding="utf-8") as f:
+            table = RateTable.from_dict(json.load(f))
+        if table.version in tables:
+            raise ValueError(f"Duplicate shipping rate version {table.version}")
+        tables[table.version] = table
+    if not tables:
+        raise ValueError(f"No shipping rate tables found in {directory}")
+    return tables
+
+
+def active_version(
+    tables: Dict[str, RateTable],
+    pinned: Optional[str] = settings.shipping_rates_version,
+) -> str:
+    if pinned:
+        if pinned not in tables:
+            raise ValueError(f"Unknown shipping rate version {pinned}")
+        return pinned
+    # Otherwise the newest table already in effect.
+    today = date.today()
+    current = [t for t in tables.values() if t.effective_from <= today]
+    return max(current or tables.values(), key=lambda t: t.effective_from).version
+
+
+RATE_TABLES = load_rate_tables()
+# (version, timestamp of the next midnight, when it must be resolved again)
+_active: Tuple[str, float] = ("", 0.0)
+
+
+# Re-resolved once per day, so a table activates on its effective_from date
+# without a restart.
+def current_version() -> str:
+    global _active
+    if time.time() >= _active[1]:
+        today = date.today()
+        midnight = datetime.combine(today + timedelta(days=1), datetime.min.time())
+        _active = (active_version(RATE_TABLES), midnight.timestamp())
+    return _active[0]
+
+
+def get_rate_table(version: Optional[str] = None) -> RateTable:
+    return RATE_TABLES[version or current_version()]
+
+
+def quote(
+    categories: Sequence[Optional[str]],
+    weights_lb: Sequence[float],
+    quantities: Sequence[int],
+    version: Optional[str] = None,
+) -> dict:
+    return get_rate_table(version).quote(categories, weights_lb, quantities)
+
+
+def rate_versions() -> List[dict]:
+    current = current_version()
+    return [
+        {
+            "version": table.version,
+            "effective_from": table.effective_from.isoformat(),
+            "active": table.version == current,
+        }
+        for table in RATE_TABLES.values()
+    ]
@@ -0,0 +1,158 @@
+import re
+from typing import List, Optional
+
+from utils.text import fold_text
+
+UNIT_ALIASES = {
+    "mg": "mg",
+    "miligramo": "mg",
+    "miligramos": "mg",
+    "milligram": "mg",
+    "milligrams": "mg",
+    "g": "g",
+    "gr": "g",
+    "grs": "g",
+    "gramo": "g",
+    "gramos": "g",
+    "gram": "g",
+    "grams": "g",
+    "kg": "kg",
+    "kgs": "kg",
+    "kilo": "kg",
+    "kilos": "kg",
+    "kilogramo": "kg",
+    "kilogramos": "kg",
+    "kilogram": "kg",
+    "kilograms": "kg",
+    "lb": "lb",
+    "lbs": "lb",
+    "libra": "lb",
+    "libras": "lb",
+    "pound": "lb",
+    "pounds": "lb",
+    "oz": "oz",
+    "onza": "oz",
+    "onzas": "oz",
+    "ounce": "oz",
+    "ounces": "oz",
+}
+
+# Keys are matched against the folded specification name, most specific first.
+WEIGHT_KEYS = [
+    ("peso del producto", 0.95),
+    ("peso del articulo", 0.95),
+    ("item weight", 0.95),
+    ("product weight", 0.95),
+    ("peso neto", 0.9),
+    ("net weight", 0.9),
+    ("dimensiones del producto", 0.85),
+    ("dimensiones del articulo", 0.85),
+    ("product dimensions", 0.85),
+    ("item dimensions", 0.85),
+    ("peso del envio", 0.75),
+    ("shipping weight", 0.75),
+    ("dimensiones del paquete", 0.75),
+    ("package dimensions", 0.75),
+    ("peso", 0.9),
+    ("weight", 0.9),
+]
+UNKNOWN_KEY_CONFIDENCE = 0.5
+# Load ratings ("Peso máximo recomendado", "Maximum Weight Recommendation",
+# "Max load") are not the item weight. Matched as word prefixes, so "max"
+# also covers maximo/maxima/maximum.
+LOAD_KEYWORDS = ("max", "capacidad", "capacity", "carga", "load", "soporta")
+LOAD_KEY_CONFIDENCE = 0.3
+
+WEIGHT_PATTERN = re.compile(
+    r"(?<![\w.,])(\d+(?:[.,]\d+)*)\s*("
+    + "|".join(sorted(UNIT_ALIASES, key=len, reverse=True))
+    + r")\.?(?![\w])"
+)
+
+THOUSANDS_PATTERN = re.compile(r"[1-9]\d{0,2}[.,]\d{3}")
+
+# "1 Pounds 4 Ounces", "2 libras y 8 onzas": the second part is a fraction of
+# the first unit and is added to it.
+COMPOUND_UNITS = {("lb", "oz"): 16, ("kg", "g"): 1000}
+COMPOUND_SEPARATOR = re.compile(r"\s*(?:,|\+|y|and|con)?\s*")
+
+NO_WEIGHT = {"weight_value": "no_weight", "weight_unit": "no_unit", "confidence": 0.0}
+
+
+def parse_number(text: str, unit: str = None) -> Optional[float]:
+    if "," in text and "." in text:
+        # Whichever separator comes last is the decimal one.
+        if text.rfind(",") > text.rfind("."):
+            text = text.replace(".", "").replace(",", ".")
+        else:
+            text = text.replace(",", "")
+    elif unit in ("g", "mg") and THOUSANDS_PATTERN.fullmatch(text):
+        # "1.000 g" / "1,250 g": fractional grams are never written this way.
+        text = text.replace(",", "").replace(".", "")
+    else:
+        text = text.replace(",", ".")
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def _key_confidence(name: str) -> float:
+    if any(word.startswith(LOAD_KEYWORDS) for word in name.split()):
+        return LOAD_KEY_CONFIDENCE
+    for key, confidence in WEIGHT_KEYS:
+        if key in name:
+            return confidence
+    return UNKNOWN_KEY_CONFIDENCE
+
+
+def _compound_part(value: str, first, following, unit: str) -> Optional[float]:
+    # The second weight, converted to the first weight's unit, when the two
+    # form one compound weight.
+    if not following:
+        return None
+    second = following[0]
+    divisor = COMPOUND_UNITS.get((unit, UNIT_ALIASES[second.group(2)]))
+    if divisor is None:
+        return None
+    if not COMPOUND_SEPARATOR.fullmatch(value[first.end() : second.start()]):
+        return None
+    number = parse_number(second.group(1), UNIT_ALIASES[second.group(2)])
+    if number is None:
+        return None
+    return number / divisor
+
+
+def parse_weight(specifications: Optional[List[dict]]) -> dict:
+    best = NO_WEIGHT
+    for spec in specifications or []:
+        name = fold_text(str(spec.get("name", "")))
+        value = fold_text(str(spec.get("value", "")))
+        matches = list(WEIGHT_PATTERN.finditer(value))
+        if not matches:
+            continue
+        match = matches[0]
+        unit = UNIT_ALIASES[match.group(2)]
+        number = parse_number(match.group(1), unit)
+        if number is None or number <= 0:
+            continue
+
+        weights = len(matches)
+        compound = _compound_part(value, match, matches[1:2], unit)
+        if compound is not None:
+            number += compound
+            weights -= 1
+
+        if unit == "mg":
+            number, unit = number / 1000, "g"
+
+        confidence = _key_confidence(name)
+        if weights > 1:
+            confidence -= 0.1
+        if confidence > best["confidence"]:
+            best = {
+                "weight_value": f"{number:.4f}".rstrip("0").rstrip("."),
+                "weight_unit": unit,
+                "confidence": confidence,
+            }
+    return best
@@ -0,0 +1,100 @@
+"""Run the same TTLCache workload on the memory and redis backends.
+
+The redis backend talks to a fakeredis server in-process, so this checks
+the real RedisBackend code path (keys, PX expiry, stale refresh, stats)
+without a Redis server. Requires `pip install fakeredis`.
+
+Usage: python -m benchmarks.cache_backends [--keys N] [--lookups N]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from amazon.cache import MemoryBackend, RedisBackend, TTLCache
+
+
+def make_value(key: str) -> dict:
+    return {"products": [{"asin": f"{key}-{i}", "title": "x" * 80} for i in range(20)]}
+
+
+async def run(backend, keys: int, lookups: int) -> dict:
+    cache = TTLCache(backend, ttl=60, stale_ttl=60)
+    fetched = []
+
+    def fetch_for(key: str):
+        async def fetch():
+            fetched.append(key)
+            return make_value(key)
+
+        return fetch
+
+    rng = random.Random(42)
+    names = [f"query-{i}" for i in range(keys)]
+    started = time.perf_counter()
+    for _ in range(lookups):
+        key = rng.choice(names)
+        value = await cache.get_or_fetch(key, fetch_for(key))
+        assert value == make_value(key), f"wrong value for {key}"
+    elapsed = time.perf_counter() - started
+    assert len(fetched) == keys, "every key should be fetched once"
+
+    # Past its fresh TTL an entry is served stale and refreshed in the
+    # background; the backend must keep it until the stale TTL runs out.
+    await cache.set(names[0], make_value(names[0]), ttl=0.05)
+    await asyncio.sleep(0.1)
+    assert not await cache.is_fresh(names[0])
+    assert await cache.get_or_fetch(names[0], fetch_for(names[0]))
+    await asyncio.sleep(0.05)
+    assert cache.refreshes == 1 and await cache.is_fresh(names[0])
+
+    await cache.delete(names[0])
+    assert await cache.get(names[0]) is None
+
+    stats = await cache.stats()
+    await cache.close()
+    return {
+        "lookups_per_second": round(lookups / elapsed),
+        "hits": stats["hits"],
+        "stale_hits": stats["stale_hits"],
+        "misses": stats["misses"],
+        "refreshes": stats["refreshes"],
+        "bytes": stats.get("bytes"),
+    }
+
+
+async def run_all(keys: int, lookups: int) -> dict:
+    try:
+        from fakeredis import FakeServer
+        from fakeredis.aioredis import FakeRedis
+    except ImportError:
+        raise SystemExit("fakeredis is required: pip install fakeredis")
+
+    client = FakeRedis(server=FakeServer())
+    backend = RedisBackend(None, "search", client)
+    # Keys are namespaced and expire on the server after the full TTL.
+    await backend.set("probe", b"1", 1.5)
+    assert 0 < await client.pttl("search:probe") <= 1500
+    await backend.delete("probe")
+    return {
+        "memory": await run(MemoryBackend(64 * 1024**2), keys, lookups),
+        "redis": await run(backend, keys, lookups),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=100)
+    parser.add_argument("--lookups", type=int, default=5000)
+    args = parser.parse_args()
+
+    results = asyncio.run(run_all(args.keys, args.lookups))
+    columns = list(results["memory"])
+    print(f"{'backend':<8} " + " ".join(f"{c:>18}" for c in columns))
+    for name, result in results.items():
+        print(f"{name:<8} " + " ".join(f"{str(result[c]):>18}" for c in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""Hammer one cart with concurrent adds.
+
+By default the adds go through the /cart endpoint to a fake PostgREST, which
+checks that every add costs exactly one database round trip and that the
+endpoint forwards every quantity. The fake applies add_cart_item atomically
+by construction, so this mode says nothing about the SQL itself.
+
+--postgres runs migration 005 on an embedded PostgreSQL (pgserver) and calls
+add_cart_item from one connection per worker at once. That mode checks that
+the upsert loses no adds under real concurrency, and that the migration
+merges existing duplicate rows. It needs `pip install pgserver psycopg[binary]`.
+
+Usage: python -m benchmarks.cart_upsert [--workers N] [--adds N] [--latency MS]
+       python -m benchmarks.cart_upsert --postgres [--workers N] [--adds N]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+
+import httpx
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost:9")
+os.environ.setdefault("SUPABASE_KEY", "benchmark")
+os.environ.setdefault("API_KEY", "benchmark")
+os.environ.setdefault("API_URL", "http://localhost:9")
+os.environ.setdefault("API_KEY_OPENAI", "benchmark")
+
+import main  # noqa: E402
+from database.supabase_client import get_db  # noqa: E402
+
+ASINS = ["B000000001", "B000000002"]
+
+
+class FakeCartTable:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.rows = {}
+        self.requests = {}
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path.rsplit("/", 1)[-1]
+        key = f"{request.method} {path}"
+        self.requests[key] = self.requests.get(key, 0) + 1
+        await asyncio.sleep(random.uniform(0, self.latency))
+
+        if request.method == "POST" and path == "add_cart_item":
+            item = json.loads(request.content)["item"]
+            row_key = (item["user_id"], item["asin"], item.get("variant_asin") or "")
+            row = self.rows.get(row_key)
+            if row is None:
+                row = dict(item, id=len(self.rows) + 1)
+                self.rows[row_key] = row
+            else:
+                row["quantity"] += item["quantity"]
+            return httpx.Response(200, json=[dict(row)])
+        if request.method == "GET" and path == "cart_items":
+            return httpx.Response(200, json=[dict(row) for row in self.rows.values()])
+        return httpx.Response(404, json={"message": f"unexpected {key}"})
+
+
+async def _enrichment(*args, **kwargs):
+    return {
+        "normalized_category": "Everything Else",
+        "weight_lb": 1.0,
+    }
+
+
+async def run(workers: int, adds: int, latency: float) -> dict:
+    fake = FakeCartTable(latency)
+    db = get_db()
+    db.client.session = httpx.AsyncClient(
+        base_url=db.client.session.base_url,
+        headers=db.client.session.headers,
+        transport=httpx.MockTransport(fake.handler),
+    )
+    main.enrichment_store.get_or_enrich = _enrichment
+    client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=main.app), base_url="http://benchmark"
+    )
+
+    # Warm the cart cache so the counts below only reflect the adds.
+    await client.get("/cart/benchmark-user")
+    fake.requests.clear()
+
+    expected = {asin: 0 for asin in ASINS}
+    failures = 0
+
+    async def worker(worker_id: int):
+        nonlocal failures
+        for i in range(adds):
+            asin = ASINS[(worker_id + i) % len(ASINS)]
+            quantity = 1 + (worker_id + i) % 3
+            expected[asin] += quantity
+            response = await client.post(
+                "/cart/benchmark-user",
+                json={
+                    "asin": asin,
+                    "quantity": quantity,
+                    "title": "Benchmark item",
+                    "price": 9.99,
+                    "image_url": "https://example.com/i.jpg",
+                    "product_link": "https://example.com/p",
+                },
+            )
+            if response.status_code != 200:
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(workers)))
+    elapsed = time.perf_counter() - started
+
+    cart = (await client.get("/cart/benchmark-user")).json()["items"]
+    await client.aclose()
+    await db.aclose()
+
+    final = {row["asin"]: row["quantity"] for row in cart}
+    total_adds = workers * adds
+    round_trips = fake.requests.get("POST add_cart_item", 0)
+    return {
+        "adds": total_adds,
+        "failures": failures,
+        "rows": len(cart),
+        "quantities_match": final == expected,
+        "expected": expected,
+        "final": final,
+        "db_requests": fake.requests,
+        "round_trips_per_add": round(round_trips / total_adds, 3),
+        "adds_per_second": round(total_adds / elapsed, 1),
+    }
+
+
+CART_ITEMS_TABLE = """
+create table cart_items (
+    id bigserial primary key,
+    user_id text not null,
+    asin text not null,
+    quantity integer not null,
+    title text,
+    price numeric,
+    image_url text,
+    product_link text,
+    variant_asin text,
+    variant_dimensions jsonb,
+    category text,
+    specifications jsonb,
+    shipping_fee numeric,
+    normalized_category text,
+    weight_lb numeric
+)
+"""
+MIGRATION = os.path.join(
+    os.path.dirname(__file__), "..", "database", "migrations", "005_cart_upsert.sql"
+)
+
+
+async def run_postgres(workers: int, adds: int) -> dict:
+    try:
+        import pgserver
+        import psycopg
+    except ImportError:
+        raise SystemExit("--postgres requires: pip install pgserver psycopg[binary]")
+
+    server = pgserver.get_server(tempfile.mkdtemp(), cleanup_mode="delete")
+    uri = server.get_uri()
+    async with await psycopg.AsyncConnection.connect(uri, autocommit=True) as conn:
+        await conn.execute(CART_ITEMS_TABLE)
+        # Duplicates as left by the old read-then-insert path; 005 must merge
+        # them into one row before adding its unique index.
+        for quantity in (1, 2):
+            await conn.execute(
+                "insert into cart_items (user_id, asin, quantity) "
+                "values ('benchmark-user', %s, %s)",
+                (ASINS[0], quantity),
+            )
+        with open(MIGRATION, encoding="utf-8") as f:
+            await conn.execute(f.read())
+
+    expected = {ASINS[0]: 3, **{asin: 0 for asin in ASINS[1:]}}
+    connections = [
+        await psycopg.AsyncConnection.connect(uri, autocommit=True)
+        for _ in range(workers)
+    ]
+
+    async def worker(worker_id: int, conn):
+        for i in range(adds):
+            asin = ASINS[(worker_id + i) % len(ASINS)]
+            quantity = 1 + (worker_id + i) % 3
+            expected[asin] += quantity
+            item = {
+                "user_id": "benchmark-user",
+                "asin": asin,
+                "quantity": quantity,
+                "title": "Benchmark item",
+                "price": 9.99,
+            }
+            await conn.execute(
+                "select * from add_cart_item(%s::jsonb)", (json.dumps(item),)
+            )
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i, conn) for i, conn in enumerate(connections)))
+    elapsed = time.perf_counter() - started
+
+    async with connections[0].cursor() as cursor:
+        await cursor.execute(
+            "select asin, quantity from cart_items where user_id = 'benchmark-user'"
+        )
+        rows = await cursor.fetchall()
+    for conn in connections:
+        await conn.close()
+    server.cleanup()
+
+    final = {asin: quantity for asin, quantity in rows}
+    return {
+        "adds": workers * adds,
+        "rows": len(rows),
+        "quantities_match": final == expected and len(rows) == len(ASINS),
+        "expected": expected,
+        "final": final,
+        "adds_per_second": round(workers * adds / elapsed, 1),
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=50)
+    parser.add_argument("--adds", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=2.0)
+    parser.add_argument("--postgres", action="store_true")
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    if args.postgres:
+        report = asyncio.run(run_postgres(args.workers, args.adds))
+        ok = report["quantities_match"]
+    else:
+        report = asyncio.run(run(args.workers, args.adds, args.latency / 1000))
+        ok = (
+            report["quantities_match"]
+            and not report["failures"]
+            and report["round_trips_per_add"] == 1
+        )
+    for key, value in report.items():
+        print(f"{key}: {value}")
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,120 @@
+"""Time how long a fresh worker takes to import the app and start serving.
+
+Usage: python -m benchmarks.cold_start [--runs N] [--importtime]
+
+Each run is a new interpreter, like a freshly forked or spawned worker, with
+every dependency faked in-process at zero latency. Reports the time to
+`import main`, to finish the lifespan startup and to answer a first request
+that touches the database, plus peak RSS. --importtime also lists the
+slowest modules imported by main.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fakes import FAKE_ENV
+
+METRICS = ("import_s", "startup_s", "first_request_s", "max_rss_mb")
+
+
+def _env() -> dict:
+    env = dict(os.environ, **FAKE_ENV)
+    env.setdefault(
+        "EXCHANGE_RATE_DB_PATH", os.path.join(tempfile.mkdtemp(), "rates.sqlite3")
+    )
+    return env
+
+
+async def _child() -> dict:
+    import httpx
+
+    from benchmarks.fakes import FakeDependencies, FakeSupabase, Latency
+
+    transport = FakeDependencies(Latency({}), FakeSupabase())
+    httpx.AsyncHTTPTransport = lambda **kwargs: transport
+
+    started = time.perf_counter()
+    import main
+
+    imported = time.perf_counter()
+    async with main.lifespan(main.app):
+        ready = time.perf_counter()
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=main.app), base_url="http://benchmark"
+        ) as client:
+            response = await client.get("/cart/user-0")
+            response.raise_for_status()
+        answered = time.perf_counter()
+    return {
+        "import_s": imported - started,
+        "startup_s": ready - imported,
+        "first_request_s": answered - ready,
+        # ru_maxrss is in KiB on Linux.
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def import_times(env: dict, top: int = 10):
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    # Lines look like "import time:  self |  cumulative |   name"; direct
+    # imports of main are indented by exactly three spaces.
+    modules = []
+    for line in output.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].startswith("   ") and parts[2][3] != " ":
+            modules.append((int(parts[1]) / 1e6, parts[2].strip()))
+    return sorted(modules, reverse=True)[:top]
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--importtime", action="store_true")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(_child())))
+        return
+
+    env = _env()
+    runs = []
+    for _ in range(args.runs):
+        result = subprocess.run(
+            [sys.executable, "-m", "benchmarks.cold_start", "--child"],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    print(f"{'':<16} {'median':>8} {'min':>8} {'max':>8}")
+    for metric in METRICS:
+        values = [run[metric] for run in runs]
+        print(
+            f"{metric:<16} {statistics.median(values):>8.3f} "
+            f"{min(values):>8.3f} {max(values):>8.3f}"
+        )
+    if args.importtime:
+        print("\nslowest imports from main (cumulative seconds):")
+        for seconds, module in import_times(env):
+            print(f"{seconds:>8.3f}  {module}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,667 @@
+"""In-process stand-ins for every external dependency of the API.
+
+One FakeDependencies transport answers for Supabase/PostgREST, the product
+API, OpenAI, Banxico and Resend, routed by host, after sleeping for the
+configured latency of that dependency. FakeTelegramSender replaces the
+Telegram bot in the outbox worker.
+"""
+
+import asyncio
+import bisect
+import hashlib
+import json
+import random
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+HOSTS = {
+    "supabase.fake": "supabase",
+    "amazon.fake": "amazon",
+    "openai.fake": "openai",
+    "banxico.fake": "banxico",
+    "resend.fake": "resend",
+}
+
+# Environment that points the app at the fakes. Applied before importing main.
+FAKE_ENV = {
+    "SUPABASE_URL": "http://supabase.fake",
+    "SUPABASE_KEY": "benchmark",
+    "API_URL": "http://amazon.fake/request",
+    "API_KEY": "benchmark",
+    "API_KEY_OPENAI": "benchmark",
+    "OPENAI_BASE_URL": "http://openai.fake/v1",
+    "BANXICO_API_URL": "http://banxico.fake/SieAPIRest/service/v1",
+    "BMX_TOKEN": "benchmark",
+    "RESEND_API_URL": "http://resend.fake",
+    "RESEND_API_KEY": "benchmark",
+    "TELEGRAM_BOT_TOKEN": "",
+    "TELEGRAM_CHAT_ID": "",
+    "ADMIN_PRIVY_ID": "benchmark-admin",
+}
+
+# Mean latency in milliseconds, roughly what production sees.
+DEFAULT_LATENCY_MS = {
+    "supabase": 15,
+    "amazon": 900,
+    "openai": 700,
+    "banxico": 250,
+    "resend": 120,
+    "telegram": 150,
+}
+
+CATEGORIES = ["Electronics", "Books", "Kitchen & Housewares", "Toy & Baby"]
+PRIMARY_KEYS = {
+    "users": "privy_id",
+    "product_enrichments": "asin",
+    "category_mappings": "raw_category",
+}
+# parent table -> (embedded table, foreign key)
+RELATIONS = {"orders": {"order_items": "order_id"}}
+
+_KEYSET = re.compile(
+    r'^\(?created_at\.lt\."(?P<created_at>[^"]+)",'
+    r'and\(created_at\.eq\."[^"]+",id\.lt\."(?P<id>[^"]+)"\)\)?$'
+)
+
+
+class Latency:
+    def __init__(self, latency_ms: Dict[str, float], jitter: float = 0.3):
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.calls: Dict[str, int] = {}
+
+    async def wait(self, dependency: str):
+        self.calls[dependency] = self.calls.get(dependency, 0) + 1
+        mean = self.latency_ms.get(dependency, 0) / 1000
+        if mean > 0:
+            await asyncio.sleep(mean * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _split(text: str) -> List[str]:
+    # Split on top-level commas, respecting parentheses and double quotes.
+    parts, depth, quoted, current = [], 0, False, ""
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        if char == "," and depth == 0 and not quoted:
+            parts.append(current.strip())
+            current = ""
+        else:
+            current += char
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+def _coerce(row_value, text: str):
+    if isinstance(row_value, bool):
+        return text == "true"
+    if isinstance(row_value, (int, float)):
+        return float(text)
+    return text
+
+
+def _matches(row: dict, column: str, op: str, value: str) -> bool:
+    current = row.get(column)
+    if op == "is":
+        return current is None if value == "null" else current == (value == "true")
+    if op == "in":
+        options = [v.strip('"') for v in _split(value.strip("()"))]
+        return current is not None and str(current) in options
+    if current is None:
+        return False
+    value = _coerce(current, value.strip('"'))
+    if isinstance(current, (int, float)) and not isinstance(current, bool):
+        current = float(current)
+    return {
+        "eq": current == value,
+        "neq": current != value,
+        "gt": current > value,
+        "gte": current >= value,
+        "lt": current < value,
+        "lte": current <= value,
+    }[op]
+
+
+def _condition(row: dict, term: str) -> bool:
+    for group, combine in (("and(", all), ("or(", any)):
+        if term.startswith(group):
+            return combine(_condition(row, t) for t in _split(term[len(group) : -1]))
+    column, op, value = term.split(".", 2)
+    return _matches(row, column, op, value)
+
+
+class FakeSupabase:
+    def __init__(self):
+        self.tables: Dict[str, List[dict]] = {
+            name: []
+            for name in (
+                "users",
+                "cart_items",
+                "orders",
+                "order_items",
+                "category_mappings",
+                "product_enrichments",
+                "notification_outbox",
+            )
+        }
+        self._ids = 0
+        # orders kept sorted by (created_at, id) ascending for keyset reads.
+        self._order_keys: List[Tuple[str, str]] = []
+        self._order_rows: List[dict] = []
+        self._items_by_order: Dict[str, List[dict]] = {}
+
+    def next_id(self) -> int:
+        self._ids += 1
+        return self._ids
+
+    def add_order(self, order: dict, items: List[dict]):
+        key = (order["created_at"], order["id"])
+        index = bisect.bisect(self._order_keys, key)
+        self._order_keys.insert(index, key)
+        self._order_rows.insert(index, order)
+        self.tables["orders"].append(order)
+        for item in items:
+            item.setdefault("id", self.next_id())
+            item["order_id"] = order["id"]
+        self.tables["order_items"].extend(items)
+        self._items_by_order[order["id"]] = items
+
+    def handle(self, request: httpx.Request) -> Tuple[int, object]:
+        path = request.url.path.split("/rest/v1/", 1)[1]
+        params = dict(request.url.params)
+        body = json.loads(request.content) if request.content else None
+        if path.startswith("rpc/"):
+            return 200, getattr(self, "rpc_" + path[4:])(**(body or {}))
+
+        table = path
+        if request.method == "GET":
+            rows = self._select(table, params)
+        elif request.method == "POST":
+            rows = self._insert(
+                table,
+                body if isinstance(body, list) else [body],
+                "merge-duplicates" in request.headers.get("prefer", ""),
+            )
+        elif request.method == "PATCH":
+            rows = [row for row in self._filter(table, params)]
+            for row in rows:
+                row.update(body)
+        elif request.method == "DELETE":
+            rows = list(self._filter(table, params))
+            doomed = {id(row) for row in rows}
+            self.tables[table] = [
+                row for row in self.tables[table] if id(row) not in doomed
+            ]
+        else:
+            return 405, {"message": request.method}
+
+        if "vnd.pgrst.object" in request.headers.get("accept", ""):
+            if len(rows) != 1:
+                return 406, {"message": "JSON object requested, multiple (or no) rows"}
+            return 200, rows[0]
+        return (201 if request.method == "POST" else 200), rows
+
+    def _filter(self, table: str, params: dict):
+        conditions = [
+            (column, *value.split(".", 1))
+            for column, value in params.items()
+            if column not in ("select", "order", "limit", "offset", "or", "on_conflict")
+        ]
+        for row in self.tables[table]:
+            if all(_matches(row, c, op, v) for c, op, v in conditions) and (
+                "or" not in params or _condition(row, "or" + params["or"])
+            ):
+                yield row
+
+    def _select(self, table: str, params: dict) -> List[dict]:
+        limit = int(params["limit"]) if "limit" in params else None
+        if table == "orders" and params.get("order") == "created_at.desc,id.desc":
+            rows = self._orders_page(params, limit)
+        else:
+            rows = list(self._filter(table, params))
+            for term in reversed(params.get("order", "").split(",")):
+                if term:
+                    column, _, direction = term.partition(".")
+                    rows.sort(
+                        key=lambda row: (row.get(column) is None, row.get(column)),
+                        reverse=direction.startswith("desc"),
+                    )
+            rows = rows[:limit] if limit is not None else rows
+        return [self._project(table, row, params.get("select", "*")) for row in rows]
+
+    def _orders_page(self, params: dict, limit: Optional[int]) -> List[dict]:
+        rest = dict(params)
+        index = len(self._order_rows)
+        keyset = _KEYSET.match(rest.pop("or", ""))
+        if keyset:
+            index = bisect.bisect_left(
+                self._order_keys, (keyset["created_at"], keyset["id"])
+            )
+        conditions = [
+            (column, *value.split(".", 1))
+            for column, value in rest.items()
+            if column not in ("select", "order", "limit", "offset")
+        ]
+        rows = []
+        for row in reversed(self._order_rows[:index]):
+            if all(_matches(row, c, op, v) for c, op, v in conditions):
+                rows.append(row)
+                if limit is not None and len(rows) == limit:
+                    break
+        return rows
+
+    def _project(self, table: str, row: dict, select: str) -> dict:
+        projected = {}
+        for column in _split(select):
+            if column == "*":
+                projected.update(row)
+            elif column.endswith("(*)"):
+                embedded = column[:-3]
+                if table == "orders" and embedded == "order_items":
+                    projected[embedded] = list(self._items_by_order.get(row["id"], []))
+                else:
+                    key = RELATIONS[table][embedded]
+                    projected[embedded] = [
+                        r for r in self.tables[embedded] if r[key] == row["id"]
+                    ]
+            else:
+                projected[column] = row.get(column)
+        return projected
+
+    def _insert(self, table: str, rows: List[dict], merge: bool) -> List[dict]:
+        key = PRIMARY_KEYS.get(table, "id")
+        existing = {row.get(key): row for row in self.tables[table]} if merge else {}
+        inserted = []
+        for row in rows:
+            if merge and row.get(key) in existing:
+                existing[row[key]].update(row)
+                inserted.append(existing[row[key]])
+                continue
+            row = dict(row)
+            if key == "id":
+                row.setdefault("id", self.next_id())
+            row.setdefault("created_at", _now().isoformat())
+            self.tables[table].append(row)
+            inserted.append(row)
+        return inserted
+
+    def _enqueue(self, event: str, payload: dict):
+        self.tables["notification_outbox"].append(
+            {
+                "id": self.next_id(),
+                "event": event,
+                "payload": payload,
+                "status": "pending",
+                "attempts": 0,
+                "available_at": _now().isoformat(),
+                "locked_until": None,
+                "last_error": None,
+            }
+        )
+
+    def rpc_add_cart_item(self, item: dict) -> List[dict]:
+        for row in self.tables["cart_items"]:
+            if (
+                row["user_id"] == item["user_id"]
+                and row["asin"] == item["asin"]
+                and row.get("variant_asin") == item.get("variant_asin")
+            ):
+                row["quantity"] += item["quantity"]
+                return [dict(row)]
+        row = dict(item, id=self.next_id())
+        self.tables["cart_items"].append(row)
+        return [dict(row)]
+
+    def rpc_create_order(self, order_data: dict, items: List[dict]) -> dict:
+        order = dict(
+            order_data,
+            id=f"order-{self.next_id():09d}",
+            created_at=_now().isoformat(),
+        )
+        self.add_order(order, [dict(item) for item in items])
+        self.tables["cart_items"] = [
+            row
+            for row in self.tables["cart_items"]
+            if row["user_id"] != order["user_id"]
+        ]
+        self._enqueue(
+            "order_created",
+            {
+                "order_id": order["id"],
+                "user_id": order["user_id"],
+                "total_amount": order["total_amount"],
+                "total_amount_usd": order["total_amount_usd"],
+            },
+        )
+        return dict(order, order_items=self._items_by_order[order["id"]])
+
+    def rpc_ship_orders(self, shipments: List[dict]) -> List[dict]:
+        orders = {row["id"]: row for row in self.tables["orders"]}
+        emails = {row["privy_id"]: row.get("email") for row in self.tables["users"]}
+        results = []
+        for shipment in shipments:
+            order = orders.get(shipment["id"])
+            if order is None:
+                results.append(
+                    {
+                        "order_id": shipment["id"],
+                        "status": "not_found",
+                        "email_queued": False,
+                    }
+                )
+                continue
+            order.update(status="shipped", shipping_guide=shipment["shipping_guide"])
+            email = emails.get(order["user_id"])
+            if email:
+                self._enqueue(
+                    "order_shipped",
+                    {
+                        "to": email,
+                        "order_id": order["id"],
+                        "shipping_guide": order["shipping_guide"],
+                    },
+                )
+            results.append(
+                {
+                    "order_id": order["id"],
+                    "status": "shipped",
+                    "email_queued": bool(email),
+                }
+            )
+        return results
+
+    def rpc_ship_order(self, p_order_id: str, p_shipping_guide: str):
+        result = self.rpc_ship_orders(
+            [{"id": p_order_id, "shipping_guide": p_shipping_guide}]
+        )
+        if result[0]["status"] == "not_found":
+            return None
+        return next(row for row in self.tables["orders"] if row["id"] == p_order_id)
+
+    def rpc_update_cart_enrichments(self, updates: List[dict]) -> int:
+        rows = {row["id"]: row for row in self.tables["cart_items"]}
+        updated = 0
+        for update in updates:
+            row = rows.get(update["id"])
+            if row is not None:
+                row.update(
+                    normalized_category=update["normalized_category"],
+                    weight_lb=update["weight_lb"],
+                    shipping_fee=update["shipping_fee"],
+                )
+                updated += 1
+        return updated
+
+    def rpc_claim_notifications(self, batch_size: int = 20, lease_seconds: int = 60):
+        now = _now()
+        claimed = []
+        for row in self.tables["notification_outbox"]:
+            due = row["status"] == "pending" and (
+                datetime.fromisoformat(row["available_at"]) <= now
+            )
+            expired = row["status"] == "processing" and (
+                datetime.fromisoformat(row["locked_until"]) < now
+            )
+            if due or expired:
+                row["status"] = "processing"
+                row["attempts"] += 1
+                row["locked_until"] = (
+                    now + timedelta(seconds=lease_seconds)
+                ).isoformat()
+                claimed.append(dict(row))
+                if len(claimed) == batch_size:
+                    break
+        return claimed
+
+    def rpc_get_order_stats(self, days: int = 0) -> dict:
+        by_status: Dict[str, dict] = {}
+        for row in self.tables["orders"]:
+            stats = by_status.setdefault(
+                row["status"],
+                {"status": row["status"], "order_count": 0, "total_amount": 0.0},
+            )
+            stats["order_count"] += 1
+            stats["total_amount"] += float(row["total_amount"])
+        return {
+            "total_users": len(self.tables["users"]),
+            "total_orders": len(self.tables["orders"]),
+            "total_order_amount": sum(s["total_amount"] for s in by_status.values()),
+            "by_status": sorted(by_status.values(), key=lambda s: s["status"]),
+            "daily": [],
+        }
+
+
+def _digest(text: str) -> int:
+    return int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def fake_asin(seed: str, i: int = 0) -> str:
+    return f"B0{(_digest(seed) + i) % 10**8:08d}"
+
+
+def amazon_response(params: dict) -> dict:
+    if params.get("engine") == "amazon_search":
+        query = params.get("q", "")
+        return {
+            "shopping_results": [
+                {
+                    "asin": fake_asin(query, i),
+                    "title": f"{query} result {i}",
+                    "price": {
+                        "value": 199.0 + i,
+                        "currency": "MXN",
+                        "raw": f"${199 + i}",
+                    },
+                    "thumbnail": f"https://m.media-amazon.com/images/I/{i}._AC_UL320_.jpg",
+                    "rating": 4.5,
+                    "ratings_total": 1000 + i,
+                    "link": f"https://www.amazon.com.mx/dp/{fake_asin(query, i)}",
+                    "brand": "Benchmark",
+                    "position": i + 1,
+                    "is_sponsored": False,
+                    "is_prime": True,
+                    "fulfillment": {"type": "amazon"},
+                }
+                for i in range(20)
+            ]
+        }
+    asin = params.get("asin", "")
+    return {
+        "product": {
+            "asin": asin,
+            "title": f"Product {asin}",
+            "description": "A product used for benchmarking.",
+            "feature_bullets": ["Fast", "Cheap"],
+            "attributes": [{"name": "Color", "value": "Black"}],
+            "images": [{"link": f"https://m.media-amazon.com/images/I/{asin}.jpg"}],
+            "buybox": {
+                "price": {"value": 499.0, "currency": "MXN", "raw": "$499.00"},
+                "availability": "In stock",
+            },
+            "rating": 4.4,
+            "reviews": 321,
+            "link": f"https://www.amazon.com.mx/dp/{asin}",
+            "brand_store": {"text": "Benchmark"},
+            "search_alias": {"title": CATEGORIES[_digest(asin) % len(CATEGORIES)]},
+            "specifications": [
+                {"name": "Peso del producto", "value": f"{_digest(asin) % 900 + 100} g"}
+            ],
+        }
+    }
+
+
+def openai_response(body: dict) -> dict:
+    name = body.get("function_call", {}).get("name", "")
+    if "category" in name:
+        arguments = {"prediction": CATEGORIES[_digest(str(body["messages"])) % 4]}
+    else:
+        arguments = {"weight_value": "1.2", "weight_unit": "kg"}
+    if name.endswith("_batch"):
+        arguments = {"results": []}
+    return {
+        "id": "chatcmpl-benchmark",
+        "object": "chat.completion",
+        "created": 0,
+        "model": body.get("model", "gpt-4o-mini"),
+        "choices": [
+            {
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {
+                    "role": "assistant",
+                    "content": None,
+                    "function_call": {"name": name, "arguments": json.dumps(arguments)},
+                },
+            }
+        ],
+        "usage": {"prompt_tokens": 120, "completion_tokens": 12, "total_tokens": 132},
+    }
+
+
+def banxico_response(path: str) -> dict:
+    today = _now().date()
+    if path.endswith("/oportuno"):
+        days = [today]
+    else:
+        start, end = (datetime.fromisoformat(p).date() for p in path.split("/")[-2:])
+        days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    return {
+        "bmx": {
+            "series": [
+                {
+                    "idSerie": "SF43718",
+                    "titulo": "Tipo de cambio FIX",
+                    "datos": [
+                        {
+                            "fecha": day.strftime("%d/%m/%Y"),
+                            "dato": f"{17 + (day.toordinal() % 100) / 100:.4f}",
+                        }
+                        for day in days
+                    ],
+                }
+            ]
+        }
+    }
+
+
+def resend_response(path: str, body) -> dict:
+    if path.endswith("/batch"):
+        return {"data": [{"id": f"email-{i}"} for i in range(len(body))]}
+    return {"id": "email-0"}
+
+
+class FakeDependencies(httpx.AsyncBaseTransport):
+    def __init__(self, latency: Latency, supabase: FakeSupabase):
+        self.latency = latency
+        self.supabase = supabase
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        dependency = HOSTS.get(request.url.host)
+        if dependency is None:
+            raise httpx.ConnectError(f"No fake for {request.url.host}", request=request)
+        await request.aread()
+        await self.latency.wait(dependency)
+
+        status, body = 200, None
+        if dependency == "supabase":
+            status, body = self.supabase.handle(request)
+        elif dependency == "amazon":
+            body = amazon_response(dict(request.url.params))
+        elif dependency == "openai":
+            body = openai_response(json.loads(request.content))
+        elif dependency == "banxico":
+            body = banxico_response(request.url.path)
+        elif dependency == "resend":
+            body = resend_response(request.url.path, json.loads(request.content))
+
+        content = json.dumps(body).encode("utf-8")
+        return httpx.Response(
+            status,
+            headers={
+                "content-type": "application/json",
+                "content-length": str(len(content)),
+            },
+            stream=httpx.ByteStream(content),
+            request=request,
+        )
+
+    async def aclose(self):
+        # Shared by every client; nothing to release.
+        pass
+
+
+class FakeTelegramSender:
+    def __init__(self, latency: Latency):
+        self.latency = latency
+        self.sent = 0
+
+    async def open(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def send(self, text: str):
+        await self.latency.wait("telegram")
+        self.sent += 1
+
+
+def seed(supabase: FakeSupabase, users: int, orders: int, rng: random.Random):
+    supabase.tables["users"] = [
+        {
+            "privy_id": f"user-{i}",
+            "wallet_address": None,
+            "email": f"user-{i}@example.com",
+        }
+        for i in range(users)
+    ]
+    supabase.tables["category_mappings"] = [
+        {"raw_category": category, "normalized_category": category}
+        for category in CATEGORIES
+    ]
+    started = _now() - timedelta(days=365)
+    step = timedelta(days=365) / max(orders, 1)
+    statuses = ["order received", "shipped", "delivered"]
+    for i in range(orders):
+        order = {
+            "id": f"order-{i:09d}",
+            "user_id": f"user-{rng.randrange(users)}",
+            "total_amount": "999.00",
+            "total_amount_usd": "50.00",
+            "status": statuses[i % 3],
+            "created_at": (started + step * i).isoformat(),
+            "full_name": "Benchmark User",
+            "street": "Calle 1",
+            "postal_code": "01000",
+            "phone": "5555555555",
+            "delivery_instructions": "",
+            "shipping_guide": None,
+            "blockchain_order_id": str(i),
+        }
+        supabase.add_order(
+            order,
+            [
+                {
+                    "asin": fake_asin("seed", i % 500),
+                    "quantity": 1,
+                    "price": 999.0,
+                    "title": "Seeded item",
+                    "image_url": None,
+                    "product_link": "https://www.amazon.com.mx/dp/x",
+                    "variant_asin": None,
+                    "variant_dimensions": None,
+                }
+            ],
+        )
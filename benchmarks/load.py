@@ -0,0 +1,323 @@
+"""Load scenarios against the full app with every dependency faked in-process.
+
+Usage:
+    python -m benchmarks.load [--scenarios search,cart,orders,admin]
+        [--concurrency N] [--requests N] [--orders N]
+        [--latency supabase=15,amazon=900,...] [--save FILE] [--baseline FILE]
+
+Reports throughput and p50/p95/p99 latency per endpoint. --save writes the
+report as JSON; --baseline compares against a previously saved report.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+import jwt
+
+from benchmarks.fakes import (
+    DEFAULT_LATENCY_MS,
+    FAKE_ENV,
+    FakeDependencies,
+    FakeSupabase,
+    FakeTelegramSender,
+    Latency,
+    fake_asin,
+    seed,
+)
+
+QUERIES = [
+    "audifonos bluetooth",
+    "cafetera",
+    "nintendo switch",
+    "libro python",
+    "tenis running",
+    "monitor 27",
+    "teclado mecanico",
+    "licuadora",
+    "mochila",
+    "cargador usb c",
+]
+
+
+def percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Recorder:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    async def call(
+        self, client: httpx.AsyncClient, name: str, method: str, url: str, **kwargs
+    ):
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.samples.setdefault(name, []).append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            self.errors[name] = self.errors.get(name, 0) + 1
+        return response
+
+    def report(self, elapsed: float) -> Dict[str, dict]:
+        return {
+            name: {
+                "requests": len(samples),
+                "errors": self.errors.get(name, 0),
+                "throughput": round(len(samples) / elapsed, 1),
+                "p50_ms": round(percentile(samples, 50) * 1000, 1),
+                "p95_ms": round(percentile(samples, 95) * 1000, 1),
+                "p99_ms": round(percentile(samples, 99) * 1000, 1),
+            }
+            for name, samples in self.samples.items()
+        }
+
+
+def cart_item(rng: random.Random) -> dict:
+    asin = fake_asin("cart", rng.randrange(200))
+    return {
+        "asin": asin,
+        "quantity": rng.randint(1, 3),
+        "title": f"Product {asin}",
+        "price": 499.0,
+        "image_url": f"https://m.media-amazon.com/images/I/{asin}.jpg",
+        "product_link": f"https://www.amazon.com.mx/dp/{asin}",
+        "category": "Electronics",
+        "specifications": [{"name": "Peso del producto", "value": "350 g"}],
+    }
+
+
+async def search_storm(client, recorder, args, rng):
+    # Zipf-like: a few queries dominate, like real traffic.
+    weights = [1 / (i + 1) for i in range(len(QUERIES))]
+
+    async def user():
+        for _ in range(args.requests):
+            query = rng.choices(QUERIES, weights)[0]
+            await recorder.call(
+                client,
+                "POST /api/searchProduct",
+                "POST",
+                "/api/searchProduct",
+                json={"query": query},
+            )
+
+    await asyncio.gather(*(user() for _ in range(args.concurrency)))
+
+
+async def add_to_cart_burst(client, recorder, args, rng):
+    async def user(i):
+        user_id = f"user-{i}"
+        for _ in range(args.requests):
+            await recorder.call(
+                client,
+                "POST /cart/{user_id}",
+                "POST",
+                f"/cart/{user_id}",
+                json=cart_item(rng),
+            )
+            await recorder.call(
+                client, "GET /cart/{user_id}", "GET", f"/cart/{user_id}"
+            )
+
+    await asyncio.gather(*(user(i) for i in range(args.concurrency)))
+
+
+async def order_creation(client, recorder, args, rng):
+    async def user(i):
+        user_id = f"user-{i}"
+        for _ in range(args.requests):
+            items = [cart_item(rng) for _ in range(rng.randint(1, 4))]
+            await recorder.call(
+                client,
+                "POST /api/orders",
+                "POST",
+                "/api/orders",
+                json={
+                    "user_id": user_id,
+                    "items": [
+                        {
+                            k: item[k]
+                            for k in (
+                                "asin",
+                                "quantity",
+                                "price",
+                                "title",
+                                "image_url",
+                                "product_link",
+                            )
+                        }
+                        for item in items
+                    ],
+                    "total_amount": 999.0,
+                    "total_amount_usd": 50.0,
+                    "full_name": "Benchmark User",
+                    "street": "Calle 1",
+                    "postal_code": "01000",
+                    "phone": "5555555555",
+                    "delivery_instructions": "",
+                    "blockchain_order_id": str(rng.randrange(10**9)),
+                },
+            )
+
+    await asyncio.gather(*(user(i) for i in range(args.concurrency)))
+
+
+async def admin_listing(client, recorder, args, rng):
+    token = jwt.encode({"sub": FAKE_ENV["ADMIN_PRIVY_ID"]}, "benchmark")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def walker(params: dict, name: str):
+        # Page through the whole table, following X-Next-Cursor.
+        cursor = None
+        while True:
+            page = dict(params, **({"cursor": cursor} if cursor else {}))
+            response = await recorder.call(
+                client, name, "GET", "/api/admin/orders", params=page, headers=headers
+            )
+            cursor = response.headers.get("x-next-cursor")
+            if not cursor or response.status_code != 200:
+                break
+
+    await asyncio.gather(
+        walker({"limit": 500}, "GET /api/admin/orders (full)"),
+        walker(
+            {"limit": 500, "fields": "id,status,total_amount,created_at"},
+            "GET /api/admin/orders (fields)",
+        ),
+        walker({"limit": 100, "status": "shipped"}, "GET /api/admin/orders (status)"),
+    )
+    await recorder.call(
+        client,
+        "GET /api/admin/orders/export",
+        "GET",
+        "/api/admin/orders/export",
+        headers=headers,
+    )
+
+
+SCENARIOS = {
+    "search": search_storm,
+    "cart": add_to_cart_burst,
+    "orders": order_creation,
+    "admin": admin_listing,
+}
+
+
+def parse_latency(text: str) -> Dict[str, float]:
+    latency = dict(DEFAULT_LATENCY_MS)
+    for part in filter(None, (text or "").split(",")):
+        name, _, value = part.partition("=")
+        latency[name.strip()] = float(value)
+    return latency
+
+
+async def run(args) -> dict:
+    for key, value in FAKE_ENV.items():
+        os.environ.setdefault(key, value)
+    os.environ.setdefault(
+        "EXCHANGE_RATE_DB_PATH", os.path.join(tempfile.mkdtemp(), "rates.sqlite3")
+    )
+    rng = random.Random(args.seed)
+    latency = Latency(parse_latency(args.latency))
+    supabase = FakeSupabase()
+    seed(supabase, users=max(args.concurrency, 100), orders=args.orders, rng=rng)
+    transport = FakeDependencies(latency, supabase)
+    # Every outbound client builds its transport through httpx.AsyncHTTPTransport.
+    httpx.AsyncHTTPTransport = lambda **kwargs: transport
+
+    import main
+
+    main.outbox_worker.senders["telegram"] = FakeTelegramSender(latency)
+
+    report = {
+        "config": {**vars(args), "latency_ms": latency.latency_ms},
+        "scenarios": {},
+    }
+    async with main.lifespan(main.app):
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=main.app),
+            base_url="http://benchmark",
+            timeout=None,
+        )
+        for name in args.scenarios.split(","):
+            recorder = Recorder()
+            calls_before = dict(latency.calls)
+            started = time.perf_counter()
+            await SCENARIOS[name](client, recorder, args, rng)
+            elapsed = time.perf_counter() - started
+            report["scenarios"][name] = {
+                "seconds": round(elapsed, 2),
+                "endpoints": recorder.report(elapsed),
+                "dependency_calls": {
+                    dependency: calls - calls_before.get(dependency, 0)
+                    for dependency, calls in latency.calls.items()
+                    if calls - calls_before.get(dependency, 0)
+                },
+            }
+        await client.aclose()
+    return report
+
+
+def print_report(report: dict, baseline: dict = None):
+    for name, scenario in report["scenarios"].items():
+        print(
+            f"\n== {name} ({scenario['seconds']}s) dependency calls: {scenario['dependency_calls']}"
+        )
+        print(
+            f"{'endpoint':<36} {'reqs':>6} {'err':>4} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}"
+        )
+        for endpoint, stats in scenario["endpoints"].items():
+            line = (
+                f"{endpoint:<36} {stats['requests']:>6} {stats['errors']:>4} "
+                f"{stats['throughput']:>8} {stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8}"
+            )
+            base = (
+                (baseline or {})
+                .get("scenarios", {})
+                .get(name, {})
+                .get("endpoints", {})
+                .get(endpoint)
+            )
+            if base and base["p99_ms"]:
+                change = (stats["p99_ms"] - base["p99_ms"]) / base["p99_ms"] * 100
+                line += f"   p99 {change:+.1f}% vs baseline"
+            print(line)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenarios", default="search,cart,orders,admin")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--latency", default="")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save")
+    parser.add_argument("--baseline")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    report = asyncio.run(run(args))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,172 @@
+"""Compare the pydantic and lean serialization paths for order lists.
+
+Usage: python -m benchmarks.order_serialization [--orders N] [--repeat N]
+
+"models" is what the order endpoints used to do: build an Order per row,
+then let FastAPI validate and encode the list against response_model.
+"lean" maps rows to dicts once and encodes them with orjson. Both outputs
+are checked to decode to the same JSON before timing.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from database.orders import PENDING_SHIPPING_GUIDE, order_to_dict
+from schemas.schemas import Order, OrderItem
+from utils.responses import LeanJSONResponse
+
+RESPONSE_FIELD = create_model_field(
+    name="Response_orders", type_=List[Order], mode="serialization"
+)
+
+
+def make_rows(count: int, rng: random.Random) -> List[dict]:
+    started = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    rows = []
+    for i in range(count):
+        order_id = f"{rng.getrandbits(128):032x}"
+        rows.append(
+            {
+                "id": order_id,
+                "user_id": f"did:privy:user-{rng.randrange(1000)}",
+                "total_amount": round(rng.uniform(100, 20000), 2),
+                "total_amount_usd": round(rng.uniform(5, 1000), 2),
+                "status": rng.choice(["order received", "shipped", "delivered"]),
+                "created_at": (
+                    started
+                    + timedelta(seconds=i * 37, microseconds=rng.randrange(10**6))
+                ).isoformat(),
+                "full_name": "Benchmark User",
+                "street": "Calle 1 #23, Col. Centro",
+                "postal_code": "01000",
+                "phone": "5555555555",
+                "delivery_instructions": "Dejar en recepción",
+                "shipping_guide": rng.choice([None, f"GUIA{i:08d}"]),
+                "blockchain_order_id": str(i),
+                "order_items": [
+                    {
+                        "id": rng.randrange(10**9),
+                        "order_id": order_id,
+                        "asin": f"B0{rng.randrange(10**8):08d}",
+                        "quantity": rng.randint(1, 3),
+                        "price": round(rng.uniform(50, 5000), 2),
+                        "title": "Audífonos inalámbricos con cancelación de ruido",
+                        "image_url": "https://m.media-amazon.com/images/I/x.jpg",
+                        "product_link": "https://www.amazon.com.mx/dp/x",
+                        "variant_asin": None,
+                        "variant_dimensions": {"Color": "Negro"},
+                    }
+                    for _ in range(rng.randint(1, 4))
+                ],
+            }
+        )
+    return rows
+
+
+def order_model(row: dict) -> Order:
+    shipping_guide = row.get("shipping_guide")
+    return Order(
+        id=row["id"],
+        user_id=row["user_id"],
+        total_amount=float(row["total_amount"]),
+        total_amount_usd=float(row["total_amount_usd"]),
+        status=row["status"],
+        created_at=row["created_at"],
+        items=[
+            OrderItem(
+                asin=item["asin"],
+                quantity=item["quantity"],
+                price=item["price"],
+                title=item["title"],
+                image_url=item.get("image_url"),
+                product_link=item.get("product_link"),
+                variant_asin=item.get("variant_asin"),
+                variant_dimensions=item.get("variant_dimensions"),
+            )
+            for item in row["order_items"]
+        ],
+        full_name=row["full_name"],
+        street=row["street"],
+        postal_code=row["postal_code"],
+        phone=row["phone"],
+        delivery_instructions=row["delivery_instructions"],
+        shipping_guide=(
+            shipping_guide if shipping_guide is not None else PENDING_SHIPPING_GUIDE
+        ),
+        blockchain_order_id=row.get("blockchain_order_id"),
+    )
+
+
+def models_path(rows: List[dict]) -> bytes:
+    content = asyncio.run(
+        serialize_response(
+            field=RESPONSE_FIELD,
+            response_content=[order_model(row) for row in rows],
+            is_coroutine=True,
+        )
+    )
+    return JSONResponse(content).body
+
+
+def lean_path(rows: List[dict]) -> bytes:
+    return LeanJSONResponse([order_to_dict(row) for row in rows]).body
+
+
+def measure(fn, rows: List[dict], repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = fn(rows)
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    fn(rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "best_ms": min(timings) * 1000,
+        "peak_mb": peak / 1024**2,
+        "body_kb": len(body) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rows = make_rows(args.orders, random.Random(args.seed))
+    if json.loads(models_path(rows)) != json.loads(lean_path(rows)):
+        raise SystemExit("lean output differs from the Order model output")
+
+    results = {
+        "models": measure(models_path, rows, args.repeat),
+        "lean": measure(lean_path, rows, args.repeat),
+    }
+    print(f"{args.orders} orders, best of {args.repeat}")
+    print(f"{'path':<8} {'time ms':>9} {'peak MB':>9} {'body KB':>9}")
+    for name, result in results.items():
+        print(
+            f"{name:<8} {result['best_ms']:>9.1f} {result['peak_mb']:>9.1f} "
+            f"{result['body_kb']:>9.1f}"
+        )
+    models, lean = results["models"], results["lean"]
+    print(
+        f"lean is {models['best_ms'] / lean['best_ms']:.1f}x faster and peaks at "
+        f"{lean['peak_mb'] / models['peak_mb']:.0%} of the memory"
+    )
+
+
+if __name__ == "__main__":
+    main()
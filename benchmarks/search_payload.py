@@ -0,0 +1,116 @@
+"""Compare /api/searchProduct payload sizes and serialization cost per mode.
+
+Usage: python -m benchmarks.search_payload [--products N] [--repeat N]
+
+"models" is the old path: validate the cached dump into a SearchResponse,
+then let FastAPI validate and encode it again against response_model. The
+other rows go through the endpoint's current path (compact_search +
+compressed_json) with different request options.
+"""
+
+import argparse
+import asyncio
+import time
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from amazon.compact import COMPACT_PRODUCT_FIELDS, compact_search
+from schemas.schemas import SearchResponse
+from utils.responses import compressed_json
+
+RESPONSE_FIELD = create_model_field(
+    name="Response_search", type_=SearchResponse, mode="serialization"
+)
+
+
+def make_dump(count: int) -> dict:
+    return {
+        "products": [
+            {
+                "asin": f"B0{i:08d}",
+                "title": "Audífonos Inalámbricos Bluetooth 5.3 con Cancelación de "
+                f"Ruido, 40 Horas de Batería, Estuche de Carga, modelo {i}",
+                "price": {
+                    "value": 499.0 + i,
+                    "currency": "MXN",
+                    "raw": f"${499 + i}.00",
+                },
+                "image": f"https://m.media-amazon.com/images/I/71x{i:04d}AbCdL._AC_UL320_.jpg",
+                "rating": 4.4,
+                "ratings_total": 1200 + i,
+                "link": f"https://www.amazon.com.mx/Audifonos-Inalambricos/dp/B0{i:08d}"
+                "/ref=sr_1_1?keywords=audifonos+bluetooth&qid=1700000000&sr=8-1",
+                "brand": "Marca",
+                "position": i + 1,
+                "is_sponsored": i % 7 == 0,
+                "is_prime": True,
+                "fulfillment": {
+                    "type": "amazon",
+                    "standard_delivery": {
+                        "text": "Entrega GRATIS el sábado, 12 de octubre",
+                        "date": "sábado, 12 de octubre",
+                    },
+                    "fastest_delivery": {
+                        "text": "O entrega más rápida mañana, 9 de octubre",
+                        "date": "mañana, 9 de octubre",
+                    },
+                },
+            }
+            for i in range(count)
+        ]
+    }
+
+
+def models_path(dump: dict) -> bytes:
+    content = asyncio.run(
+        serialize_response(
+            field=RESPONSE_FIELD,
+            response_content=SearchResponse.model_validate(dump),
+            is_coroutine=True,
+        )
+    )
+    return JSONResponse(content).body
+
+
+def endpoint_path(accept_encoding=None, fields=None, limit=None, width=None):
+    def run(dump: dict) -> bytes:
+        return compressed_json(
+            compact_search(dump, fields, limit, width), accept_encoding
+        ).body
+
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    dump = make_dump(args.products)
+    compact = dict(fields=COMPACT_PRODUCT_FIELDS, limit=20, width=240)
+    modes = {
+        "models": models_path,
+        "full": endpoint_path(),
+        "full gzip": endpoint_path("gzip"),
+        "compact": endpoint_path(**compact),
+        "compact gzip": endpoint_path("gzip", **compact),
+        "full br": endpoint_path("br"),
+        "compact br": endpoint_path("br", **compact),
+    }
+
+    print(f"{args.products} products, best of {args.repeat}")
+    print(f"{'mode':<14} {'us':>9} {'bytes':>9}")
+    for name, fn in modes.items():
+        best = float("inf")
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            body = fn(dump)
+            best = min(best, time.perf_counter() - started)
+        print(f"{name:<14} {best * 1e6:>9.0f} {len(body):>9}")
+
+
+if __name__ == "__main__":
+    main()
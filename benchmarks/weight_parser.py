@@ -0,0 +1,63 @@
+"""Accuracy and throughput of the local weight parser.
+
+Usage: python -m benchmarks.weight_parser [--iterations N] [--min-confidence X]
+"""
+
+import argparse
+import json
+import os
+import time
+
+from amazon.spec_parser import parse_weight
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "data", "weight_specs.json")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--min-confidence", type=float, default=0.7)
+    args = parser.parse_args()
+
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        corpus = json.load(f)
+
+    local = 0
+    correct = 0
+    for case in corpus:
+        result = parse_weight(case["specifications"])
+        expected = (case["weight_value"], case["weight_unit"])
+        if result["confidence"] < args.min_confidence:
+            # Low-confidence answers go to the LLM; count them as fallbacks.
+            if expected[0] != "no_weight":
+                print(f"LLM fallback: {case['specifications']} -> {result}")
+            continue
+        local += 1
+        if (result["weight_value"], result["weight_unit"]) == expected:
+            correct += 1
+        else:
+            print(f"MISMATCH: {case['specifications']} -> {result}")
+            print(f"  expected {expected}")
+
+    started = time.perf_counter()
+    for _ in range(args.iterations):
+        for case in corpus:
+            parse_weight(case["specifications"])
+    elapsed = time.perf_counter() - started
+    parsed = args.iterations * len(corpus)
+
+    print(f"cases: {len(corpus)}")
+    print(
+        f"handled locally (confidence >= {args.min_confidence}): "
+        f"{local / len(corpus):.1%}"
+    )
+    if local:
+        print(f"accuracy of local answers: {correct / local:.1%}")
+    print(
+        f"throughput: {parsed / elapsed:,.0f} specs/sec "
+        f"({elapsed / parsed * 1e6:.1f} us each)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import os
+import typing
+from dataclasses import dataclass, fields
+from typing import Optional
+
+from dotenv import load_dotenv
+
+
+# One attribute per environment variable: `amazon_api_timeout` is read from
+# AMAZON_API_TIMEOUT. Unset variables keep the default below.
+@dataclass(frozen=True)
+class Settings:
+    # Required to serve traffic; checked by require() at startup, not import.
+    supabase_url: Optional[str] = None
+    supabase_key: Optional[str] = None
+    api_key: Optional[str] = None
+    api_url: Optional[str] = None
+    api_key_openai: Optional[str] = None
+
+    admin_wallet_address: Optional[str] = None
+    admin_privy_id: Optional[str] = None
+
+    db_pool_size: int = 20
+    db_query_timeout: float = 10
+
+    # The upstream API lives on a single host, so the pool limits below are
+    # effectively per-host limits for that host.
+    amazon_api_max_connections: int = 50
+    amazon_api_max_keepalive: int = 20
+    amazon_api_keepalive_expiry: float = 30
+    amazon_api_timeout: float = 30
+    amazon_api_http2: bool = True
+
+    product_cache_backend: str = "memory"
+    product_cache_ttl: float = 3600
+    product_cache_stale_ttl: float = 86400
+    product_cache_max_bytes: int = 64 * 1024**2
+    search_cache_backend: str = "memory"
+    search_cache_ttl: float = 900
+    search_cache_stale_ttl: float = 3600
+    search_cache_max_bytes: int = 64 * 1024**2
+    search_warm_top_n: int = 20
+    search_warm_interval: float = 300
+    search_frequency_window: float = 3600
+    redis_url: Optional[str] = None
+
+    category_classifier_min_score: float = 0.8
+    weight_parser_min_confidence: float = 0.7
+    enrich_on_product_details: bool = True
+    ai_max_concurrency: int = 10
+    ai_timeout: float = 8
+
+    bmx_token: Optional[str] = None
+    banxico_api_url: str = "https://www.banxico.org.mx/SieAPIRest/service/v1"
+    # FIX rate (pesos per dollar), published once per business day.
+    exchange_rate_series: str = "SF43718"
+    exchange_rate_db_path: str = "exchange_rates.sqlite3"
+    exchange_rate_refresh_interval: float = 3600
+    exchange_rate_retry_interval: float = 300
+    exchange_rate_max_age: float = 600
+
+    shipping_rates_dir: str = os.path.join(os.path.dirname(__file__), "amazon", "rates")
+    shipping_rates_version: Optional[str] = None
+    max_quote_items: int = 1000
+
+    telegram_bot_token: Optional[str] = None
+    telegram_chat_id: Optional[str] = None
+    resend_api_key: Optional[str] = None
+    resend_api_url: str = "https://api.resend.com"
+    email_from: str = "Coinshop <guides@mail.coinshop.world>"
+    notification_workers: int = 4
+    notification_max_attempts: int = 8
+    # Resend allows 2 requests/second by default; Telegram about 1 message/second
+    # per chat.
+    notification_telegram_rate: float = 1
+    notification_email_rate: float = 2
+    max_bulk_shipments: int = 1000
+
+    # Server processes, as gunicorn and uvicorn --workers read it.
+    web_concurrency: int = 1
+    # The cart cache lives in each process, so a write on one worker is not
+    # seen by another. Unset, it is on (15s) with one worker and off with more.
+    cart_cache_ttl: Optional[float] = None
+    stats_cache_ttl: float = 30
+
+    metrics_tracing: bool = True
+
+    @classmethod
+    def from_env(cls, environ=os.environ) -> "Settings":
+        hints = typing.get_type_hints(cls)
+        values = {}
+        for field in fields(cls):
+            name = field.name.upper()
+            raw = environ.get(name)
+            if raw is not None:
+                try:
+                    values[field.name] = _parse(hints[field.name], raw)
+                except ValueError as e:
+                    raise ValueError(f"Invalid {name}: {e}")
+        return cls(**values)
+
+    def require(self, *names: str):
+        missing = [name.upper() for name in names if not getattr(self, name)]
+        if missing:
+            raise RuntimeError(
+                f"Missing required environment variables: {', '.join(missing)}"
+            )
+
+
+_TRUE = ("1", "true", "yes", "on")
+_FALSE = ("0", "false", "no", "off", "")
+
+
+def _parse(kind, raw: str):
+    # Optional[X] fields parse as X.
+    if typing.get_origin(kind) is typing.Union:
+        kind = next(arg for arg in typing.get_args(kind) if arg is not type(None))
+    if kind is bool:
+        value = raw.strip().lower()
+        if value in _TRUE:
+            return True
+        if value in _FALSE:
+            return False
+        raise ValueError(f"Expected a boolean, got {raw!r}")
+    if kind in (int, float):
+        return kind(raw)
+    return raw
+
+
+load_dotenv()
+settings = Settings.from_env()
@@ -0,0 +1,155 @@
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+# ETags embed a per-process id so a version issued by one worker never
+# matches a different worker's cache.
+INSTANCE_ID = uuid.uuid4().hex[:8]
+
+
+def item_key(row: dict) -> str:
+    return f"{row['asin']}:{row.get('variant_asin') or ''}"
+
+
+class CartEntry:
+    def __init__(self, items: Dict[str, dict], version: int, history: int):
+        self.items = items
+        self.version = version
+        self.loaded_at = time.monotonic()
+        # (version, key) for every change, oldest first. Deltas can be served
+        # for any version from `floor` on.
+        self.changes: Deque[Tuple[int, str]] = deque(maxlen=history)
+        self.floor = version
+
+    @property
+    def etag(self) -> str:
+        return f'W/"{INSTANCE_ID}-{self.version}"'
+
+    def rows(self) -> List[dict]:
+        return list(self.items.values())
+
+    def touch(self, key: str, version: int):
+        if len(self.changes) == self.changes.maxlen:
+            self.floor = self.changes[0][0]
+        self.version = version
+        self.changes.append((version, key))
+
+    def delta(self, since: int) -> Optional[Tuple[List[dict], List[dict]]]:
+        if since < self.floor or since > self.version:
+            return None
+        changed = {key for version, key in self.changes if version > since}
+        items = [self.items[key] for key in changed if key in self.items]
+        removed = [
+            {"asin": key.split(":", 1)[0], "variant_asin": key.split(":", 1)[1] or None}
+            for key in changed
+            if key not in self.items
+        ]
+        return items, removed
+
+
+class CartCache:
+    # A ttl of 0 disables caching: every read goes to the database and only
+    # version bookkeeping is kept.
+    def __init__(self, ttl: float = 15, max_users: int = 10000, history: int = 50):
+        self.ttl = ttl
+        self.enabled = ttl > 0
+        self.max_users = max_users
+        self.history = history
+        self._entries: "OrderedDict[str, CartEntry]" = OrderedDict()
+        # Versions come from one process-wide counter so they never repeat,
+        # even after an entry is evicted and reloaded.
+        self._version = 0
+        # Version of each user's latest write, kept even when the user has
+        # no entry, so a read that started before it is not cached.
+        self._writes: "OrderedDict[str, int]" = OrderedDict()
+        self._forgotten_write = 0
+
+    def get(self, user_id: str) -> Optional[CartEntry]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.loaded_at > self.ttl:
+            del self._entries[user_id]
+            return None
+        self._entries.move_to_end(user_id)
+        return entry
+
+    def read_token(self) -> int:
+        # Take before querying the DB and pass to load() with the rows.
+        return self._version
+
+    def load(
+        self, user_id: str, rows: List[dict], token: Optional[int] = None
+    ) -> CartEntry:
+        entry = CartEntry(
+            {item_key(row): row for row in rows}, self._next_version(), self.history
+        )
+        if token is not None and self._written_since(user_id, token):
+            # The rows may predate a concurrent add or remove: serve them to
+            # this request only and keep whatever is newer.
+            return self.get(user_id) or entry
+        self._store(user_id, entry)
+        return entry
+
+    def upsert(self, user_id: str, rows: List[dict]) -> Optional[CartEntry]:
+        self._record_write(user_id)
+        entry = self.get(user_id)
+        if entry is None:
+            return None
+        for row in rows:
+            key = item_key(row)
+            entry.items[key] = row
+            entry.touch(key, self._next_version())
+        return entry
+
+    def remove(self, user_id: str, asin: str) -> Optional[CartEntry]:
+        self._record_write(user_id)
+        entry = self.get(user_id)
+        if entry is None:
+            return None
+        for key in [key for key, row in entry.items.items() if row["asin"] == asin]:
+            del entry.items[key]
+            entry.touch(key, self._next_version())
+        return entry
+
+    def clear(self, user_id: str) -> CartEntry:
+        self._record_write(user_id)
+        return self.load(user_id, [])
+
+    def parse_etag(self, etag: Optional[str]) -> Optional[int]:
+        if not etag:
+            return None
+        value = etag.strip()
+        if value.startswith("W/"):
+            value = value[2:]
+        instance_id, _, version = value.strip('"').partition("-")
+        if instance_id != INSTANCE_ID or not version.isdigit():
+            return None
+        return int(version)
+
+    def _next_version(self) -> int:
+        self._version += 1
+        return self._version
+
+    def _record_write(self, user_id: str):
+        self._writes[user_id] = self._next_version()
+        self._writes.move_to_end(user_id)
+        while len(self._writes) > self.max_users:
+            _, version = self._writes.popitem(last=False)
+            self._forgotten_write = max(self._forgotten_write, version)
+
+    def _written_since(self, user_id: str, token: int) -> bool:
+        entry = self._entries.get(user_id)
+        if entry is not None and entry.version > token:
+            return True
+        # A user whose record was evicted is treated as recently written.
+        return self._writes.get(user_id, self._forgotten_write) > token
+
+    def _store(self, user_id: str, entry: CartEntry):
+        if not self.enabled:
+            return
+        self._entries[user_id] = entry
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_users:
+            self._entries.popitem(last=False)
@@ -0,0 +1,67 @@
+import csv
+import io
+import json
+import zlib
+from typing import AsyncIterator
+
+from database.orders import ORDER_COLUMNS
+
+ITEM_COLUMNS = [
+    "asin",
+    "quantity",
+    "price",
+    "title",
+    "image_url",
+    "product_link",
+    "variant_asin",
+    "variant_dimensions",
+]
+# Rows are buffered into chunks of roughly this size before being sent.
+CHUNK_SIZE = 64 * 1024
+
+
+async def ndjson_lines(rows: AsyncIterator[dict]) -> AsyncIterator[str]:
+    async for row in rows:
+        yield json.dumps(row, default=str, ensure_ascii=False) + "\n"
+
+
+async def csv_lines(rows: AsyncIterator[dict]) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(ORDER_COLUMNS + [f"item_{column}" for column in ITEM_COLUMNS])
+    async for row in rows:
+        order = [row.get(column) for column in ORDER_COLUMNS]
+        # One line per order item; orders without items still get one line.
+        for item in row.get("order_items") or [{}]:
+            values = [item.get(column) for column in ITEM_COLUMNS]
+            if isinstance(values[-1], dict):
+                values[-1] = json.dumps(values[-1], ensure_ascii=False)
+            writer.writerow(order + values)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+async def encode_chunks(
+    lines: AsyncIterator[str], compress: bool = False
+) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if compress else None
+    chunk = []
+    size = 0
+    async for line in lines:
+        data = line.encode("utf-8")
+        chunk.append(data)
+        size += len(data)
+        if size >= CHUNK_SIZE:
+            data = b"".join(chunk)
+            chunk, size = [], 0
+            if compressor is not None:
+                data = compressor.compress(data)
+            if data:
+                yield data
+
+    data = b"".join(chunk)
+    if compressor is not None:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
@@ -0,0 +1,5 @@
+create table if not exists category_mappings (
+    raw_category text primary key,
+    normalized_category text not null,
+    created_at timestamptz not null default now()
+);
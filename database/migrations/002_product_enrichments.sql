@@ -0,0 +1,7 @@
+create table if not exists product_enrichments (
+    asin text primary key,
+    normalized_category text not null,
+    weight_lb numeric not null,
+    shipping_fee numeric not null,
+    updated_at timestamptz not null default now()
+);
@@ -0,0 +1,71 @@
+-- Per-day, per-status order aggregates maintained on every order write, so
+-- /api/stats never scans the orders table.
+create table if not exists order_stats_daily (
+    day date not null,
+    status text not null,
+    order_count bigint not null default 0,
+    total_amount numeric not null default 0,
+    primary key (day, status)
+);
+
+create or replace function apply_order_stats() returns trigger
+language plpgsql as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        update order_stats_daily
+        set order_count = order_count - 1,
+            total_amount = total_amount - coalesce(old.total_amount, 0)
+        where day = old.created_at::date and status = old.status;
+    end if;
+
+    if tg_op in ('INSERT', 'UPDATE') then
+        insert into order_stats_daily (day, status, order_count, total_amount)
+        values (new.created_at::date, new.status, 1, coalesce(new.total_amount, 0))
+        on conflict (day, status) do update
+        set order_count = order_stats_daily.order_count + 1,
+            total_amount = order_stats_daily.total_amount + excluded.total_amount;
+    end if;
+
+    return null;
+end;
+$$;
+
+drop trigger if exists orders_stats on orders;
+create trigger orders_stats
+after insert or delete or update of status, total_amount, created_at on orders
+for each row execute function apply_order_stats();
+
+insert into order_stats_daily (day, status, order_count, total_amount)
+select created_at::date, status, count(*), coalesce(sum(total_amount), 0)
+from orders
+group by 1, 2
+on conflict (day, status) do update
+set order_count = excluded.order_count,
+    total_amount = excluded.total_amount;
+
+create or replace function get_order_stats(days integer default 0) returns json
+language sql stable as $$
+    select json_build_object(
+        'total_users', (select count(*) from users),
+        'total_orders', (select coalesce(sum(order_count), 0) from order_stats_daily),
+        'total_order_amount',
+            (select coalesce(sum(total_amount), 0) from order_stats_daily),
+        'by_status', (
+            select coalesce(json_agg(s order by s.status), '[]'::json)
+            from (
+                select status, sum(order_count) as order_count,
+                       sum(total_amount) as total_amount
+                from order_stats_daily
+                group by status
+            ) s
+        ),
+        'daily', (
+            select coalesce(json_agg(d order by d.day, d.status), '[]'::json)
+            from (
+                select day, status, order_count, total_amount
+                from order_stats_daily
+                where days > 0 and day > current_date - days
+            ) d
+        )
+    );
+$$;
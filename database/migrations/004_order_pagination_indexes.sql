@@ -0,0 +1,6 @@
+-- Keyset pagination on (created_at, id), newest first.
+create index if not exists orders_created_at_id_idx
+    on orders (created_at desc, id desc);
+create index if not exists orders_user_created_at_id_idx
+    on orders (user_id, created_at desc, id desc);
+create index if not exists order_items_order_id_idx on order_items (order_id);
@@ -0,0 +1,40 @@
+-- One row per (user, product, variant) so adds can be a single atomic upsert.
+-- Existing duplicates are merged into the oldest row first.
+with ranked as (
+    select id,
+           first_value(id) over w as keep_id,
+           sum(quantity) over (partition by user_id, asin, coalesce(variant_asin, '')) as total
+    from cart_items
+    window w as (partition by user_id, asin, coalesce(variant_asin, '') order by id)
+)
+update cart_items c
+set quantity = r.total
+from ranked r
+where c.id = r.id and r.id = r.keep_id;
+
+delete from cart_items c
+using cart_items keep
+where keep.user_id = c.user_id
+  and keep.asin = c.asin
+  and coalesce(keep.variant_asin, '') = coalesce(c.variant_asin, '')
+  and keep.id < c.id;
+
+create unique index if not exists cart_items_user_asin_variant_key
+    on cart_items (user_id, asin, (coalesce(variant_asin, '')));
+
+-- Insert the item or add to its quantity, returning the final row.
+create or replace function add_cart_item(item jsonb) returns setof cart_items
+language sql as $$
+    insert into cart_items (
+        user_id, asin, quantity, title, price, image_url, product_link,
+        variant_asin, variant_dimensions, category, specifications,
+        shipping_fee, normalized_category, weight_lb
+    )
+    select user_id, asin, quantity, title, price, image_url, product_link,
+           variant_asin, variant_dimensions, category, specifications,
+           shipping_fee, normalized_category, weight_lb
+    from jsonb_populate_record(null::cart_items, item)
+    on conflict (user_id, asin, (coalesce(variant_asin, ''))) do update
+    set quantity = cart_items.quantity + excluded.quantity
+    returning *;
+$$;
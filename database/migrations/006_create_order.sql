@@ -0,0 +1,38 @@
+-- Create an order with its items and clear the user's cart in one transaction,
+-- returning the order with order_items embedded like select("*, order_items(*)").
+create or replace function create_order(order_data jsonb, items jsonb) returns json
+language plpgsql as $$
+declare
+    new_order orders;
+begin
+    insert into orders (
+        user_id, total_amount, total_amount_usd, status, full_name, street,
+        postal_code, phone, delivery_instructions, shipping_guide,
+        blockchain_order_id
+    )
+    select user_id, total_amount, total_amount_usd, status, full_name, street,
+           postal_code, phone, delivery_instructions, shipping_guide,
+           blockchain_order_id
+    from jsonb_populate_record(null::orders, order_data)
+    returning * into new_order;
+
+    insert into order_items (
+        order_id, asin, quantity, price, title, image_url, product_link,
+        variant_asin, variant_dimensions
+    )
+    select new_order.id, asin, quantity, price, title, image_url, product_link,
+           variant_asin, variant_dimensions
+    from jsonb_populate_recordset(null::order_items, items);
+
+    delete from cart_items where user_id = new_order.user_id;
+
+    return (
+        select to_jsonb(new_order) || jsonb_build_object(
+            'order_items',
+            coalesce(jsonb_agg(to_jsonb(oi)), '[]'::jsonb)
+        )
+        from order_items oi
+        where oi.order_id = new_order.id
+    )::json;
+end;
+$$;
@@ -0,0 +1,127 @@
+-- Notifications are written to an outbox in the same transaction as the
+-- order change and delivered later by notifications.outbox.OutboxWorker.
+create table if not exists notification_outbox (
+    id bigint generated always as identity primary key,
+    event text not null,
+    payload jsonb not null,
+    status text not null default 'pending',
+    attempts integer not null default 0,
+    available_at timestamptz not null default now(),
+    locked_until timestamptz,
+    last_error text,
+    created_at timestamptz not null default now(),
+    sent_at timestamptz
+);
+
+create index if not exists notification_outbox_ready_idx
+    on notification_outbox (available_at, id)
+    where status in ('pending', 'processing');
+
+-- Lease up to batch_size due events. Rows whose lease expired (a worker died
+-- mid-send) are handed out again. SKIP LOCKED lets several workers claim
+-- concurrently without blocking each other.
+create or replace function claim_notifications(
+    batch_size integer default 20,
+    lease_seconds integer default 60
+) returns setof notification_outbox
+language sql as $$
+    update notification_outbox n
+    set status = 'processing',
+        attempts = n.attempts + 1,
+        locked_until = now() + make_interval(secs => lease_seconds)
+    where n.id in (
+        select id
+        from notification_outbox
+        where (status = 'pending' and available_at <= now())
+           or (status = 'processing' and locked_until < now())
+        order by available_at, id
+        limit batch_size
+        for update skip locked
+    )
+    returning n.*;
+$$;
+
+create or replace function create_order(order_data jsonb, items jsonb) returns json
+language plpgsql as $$
+declare
+    new_order orders;
+begin
+    insert into orders (
+        user_id, total_amount, total_amount_usd, status, full_name, street,
+        postal_code, phone, delivery_instructions, shipping_guide,
+        blockchain_order_id
+    )
+    select user_id, total_amount, total_amount_usd, status, full_name, street,
+           postal_code, phone, delivery_instructions, shipping_guide,
+           blockchain_order_id
+    from jsonb_populate_record(null::orders, order_data)
+    returning * into new_order;
+
+    insert into order_items (
+        order_id, asin, quantity, price, title, image_url, product_link,
+        variant_asin, variant_dimensions
+    )
+    select new_order.id, asin, quantity, price, title, image_url, product_link,
+           variant_asin, variant_dimensions
+    from jsonb_populate_recordset(null::order_items, items);
+
+    delete from cart_items where user_id = new_order.user_id;
+
+    insert into notification_outbox (event, payload)
+    values (
+        'order_created',
+        jsonb_build_object(
+            'order_id', new_order.id,
+            'user_id', new_order.user_id,
+            'total_amount', new_order.total_amount,
+            'total_amount_usd', new_order.total_amount_usd
+        )
+    );
+
+    return (
+        select to_jsonb(new_order) || jsonb_build_object(
+            'order_items',
+            coalesce(jsonb_agg(to_jsonb(oi)), '[]'::jsonb)
+        )
+        from order_items oi
+        where oi.order_id = new_order.id
+    )::json;
+end;
+$$;
+
+-- Mark an order shipped and enqueue the customer email in one transaction.
+-- Returns null when the order does not exist.
+create or replace function ship_order(
+    p_order_id orders.id%type,
+    p_shipping_guide text
+) returns json
+language plpgsql as $$
+declare
+    shipped orders;
+    user_email text;
+begin
+    update orders
+    set status = 'shipped', shipping_guide = p_shipping_guide
+    where id = p_order_id
+    returning * into shipped;
+
+    if not found then
+        return null;
+    end if;
+
+    select email into user_email from users where privy_id = shipped.user_id;
+    if user_email is not null then
+        insert into notification_outbox (event, payload)
+        values (
+            'order_shipped',
+            jsonb_build_object(
+                'to', user_email,
+                'order_id', shipped.id,
+                'shipping_guide', shipped.shipping_guide
+            )
+        );
+    end if;
+
+    return to_json(shipped);
+end;
+$$;
@@ -0,0 +1,38 @@
+-- Mark many orders shipped in one statement and enqueue their customer emails.
+-- shipments is a JSON array of {"id": ..., "shipping_guide": ...}. Returns one
+-- {order_id, status, email_queued} object per input order.
+create or replace function ship_orders(shipments jsonb) returns json
+language sql as $$
+    with input as (
+        select distinct on (id) id, shipping_guide
+        from jsonb_populate_recordset(null::orders, shipments)
+    ),
+    shipped as (
+        update orders o
+        set status = 'shipped', shipping_guide = i.shipping_guide
+        from input i
+        where o.id = i.id
+        returning o.id, o.user_id, o.shipping_guide
+    ),
+    queued as (
+        insert into notification_outbox (event, payload)
+        select 'order_shipped',
+               jsonb_build_object(
+                   'to', u.email,
+                   'order_id', s.id,
+                   'shipping_guide', s.shipping_guide
+               )
+        from shipped s
+        join users u on u.privy_id = s.user_id
+        where u.email is not null
+        returning payload ->> 'order_id' as order_id
+    )
+    select coalesce(json_agg(json_build_object(
+        'order_id', i.id,
+        'status', case when s.id is null then 'not_found' else 'shipped' end,
+        'email_queued', q.order_id is not null
+    )), '[]'::json)
+    from input i
+    left join shipped s on s.id = i.id
+    left join queued q on q.order_id = i.id::text;
+$$;
@@ -0,0 +1,16 @@
+-- Apply a backfill chunk in one statement. updates is a JSON array of
+-- {"id", "normalized_category", "weight_lb", "shipping_fee"}; only those
+-- columns change. Returns the number of rows updated.
+create or replace function update_cart_enrichments(updates jsonb) returns integer
+language sql as $$
+    with updated as (
+        update cart_items c
+        set normalized_category = u.normalized_category,
+            weight_lb = u.weight_lb,
+            shipping_fee = u.shipping_fee
+        from jsonb_populate_recordset(null::cart_items, updates) u
+        where c.id = u.id
+        returning c.id
+    )
+    select count(*)::integer from updated;
+$$;
@@ -0,0 +1,3 @@
+-- Shipping fees are priced from the rate table in effect when an item is
+-- added, so enrichments only keep what the fee is computed from.
+alter table product_enrichments drop column if exists shipping_fee;
@@ -0,0 +1,51 @@
+-- The id as orders.id's type, or null when the text does not parse as one.
+create or replace function try_order_id(value text) returns orders.id%type
+language plpgsql immutable as $$
+declare
+    result orders.id%type;
+begin
+    result := value;
+    return result;
+exception when others then
+    return null;
+end;
+$$;
+
+-- Same as 008, but ids that are not valid for orders.id are reported as
+-- not_found instead of failing the whole batch.
+create or replace function ship_orders(shipments jsonb) returns json
+language sql as $$
+    with input as (
+        select distinct on (s.id) s.id as raw_id, try_order_id(s.id) as id,
+               s.shipping_guide
+        from jsonb_to_recordset(shipments) as s(id text, shipping_guide text)
+    ),
+    shipped as (
+        update orders o
+        set status = 'shipped', shipping_guide = i.shipping_guide
+        from input i
+        where o.id = i.id
+        returning o.id, o.user_id, o.shipping_guide
+    ),
+    queued as (
+        insert into notification_outbox (event, payload)
+        select 'order_shipped',
+               jsonb_build_object(
+                   'to', u.email,
+                   'order_id', s.id,
+                   'shipping_guide', s.shipping_guide
+               )
+        from shipped s
+        join users u on u.privy_id = s.user_id
+        where u.email is not null
+        returning payload ->> 'order_id' as order_id
+    )
+    select coalesce(json_agg(json_build_object(
+        'order_id', i.raw_id,
+        'status', case when s.id is null then 'not_found' else 'shipped' end,
+        'email_queued', q.order_id is not null
+    )), '[]'::json)
+    from input i
+    left join shipped s on s.id = i.id
+    left join queued q on q.order_id = i.id::text;
+$$;
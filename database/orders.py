@@ -0,0 +1,171 @@
+import base64
+import json
+import re
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+ORDER_COLUMNS = [
+    "id",
+    "user_id",
+    "total_amount",
+    "total_amount_usd",
+    "status",
+    "created_at",
+    "full_name",
+    "street",
+    "postal_code",
+    "phone",
+    "delivery_instructions",
+    "shipping_guide",
+    "blockchain_order_id",
+]
+MAX_PAGE_SIZE = 500
+PENDING_SHIPPING_GUIDE = "Generando orden de envío"
+
+_CURSOR_ID = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+def encode_cursor(row: dict) -> str:
+    payload = json.dumps([row["created_at"], row["id"]]).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii")
+
+
+# Cursor values end up inside a quoted PostgREST filter, so they are
+# re-serialized rather than passed through: created_at must be a timestamp and
+# the id a plain token (uuid, integer or similar) with nothing to escape.
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        created_at, order_id = json.loads(base64.urlsafe_b64decode(cursor))
+        created_at = datetime.fromisoformat(created_at).isoformat()
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if isinstance(order_id, bool) or not isinstance(order_id, (str, int)):
+        raise ValueError("Invalid cursor")
+    order_id = str(order_id)
+    if not _CURSOR_ID.fullmatch(order_id):
+        raise ValueError("Invalid cursor")
+    return created_at, order_id
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    if not fields:
+        return None
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = set(requested) - set(ORDER_COLUMNS) - {"items"}
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return requested
+
+
+def select_columns(fields: Optional[List[str]]) -> str:
+    if fields is None:
+        return "*, order_items(*)"
+    # created_at and id are always needed to build the next cursor.
+    columns = [c for c in ORDER_COLUMNS if c in fields or c in ("id", "created_at")]
+    if "items" in fields:
+        columns.append("order_items(*)")
+    return ", ".join(columns)
+
+
+async def fetch_orders_page(
+    db,
+    fields: Optional[List[str]] = None,
+    user_id: Optional[str] = None,
+    status: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+) -> Tuple[List[dict], Optional[str]]:
+    query = db.table("orders").select(select_columns(fields))
+    if user_id is not None:
+        query = query.eq("user_id", user_id)
+    if status is not None:
+        query = query.eq("status", status)
+    if date_from is not None:
+        query = query.gte("created_at", date_from.isoformat())
+    if date_to is not None:
+        query = query.lt("created_at", date_to.isoformat())
+    if cursor is not None:
+        created_at, order_id = decode_cursor(cursor)
+        query = query.or_(
+            f'created_at.lt."{created_at}",'
+            f'and(created_at.eq."{created_at}",id.lt."{order_id}")'
+        )
+
+    limit = min(limit, MAX_PAGE_SIZE)
+    query = query.order("created_at", desc=True).order("id", desc=True).limit(limit + 1)
+    rows = (await db.execute(query)).data
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1])
+    return rows, next_cursor
+
+
+def project_order(row: dict, fields: List[str]) -> dict:
+    projected = {}
+    for field in fields:
+        if field == "items":
+            projected["items"] = row.get("order_items", [])
+        elif (
+            field in ("total_amount", "total_amount_usd") and row.get(field) is not None
+        ):
+            projected[field] = float(row[field])
+        else:
+            projected[field] = row.get(field)
+    return projected
+
+
+def _float(value) -> Optional[float]:
+    return float(value) if value is not None else None
+
+
+def order_to_dict(row: dict) -> dict:
+    # Same keys, order and value types as the Order model, built straight
+    # from the row so list endpoints skip two rounds of pydantic validation.
+    # created_at is a datetime so the encoder formats it the way pydantic does.
+    shipping_guide = row.get("shipping_guide")
+    return {
+        "id": row["id"],
+        "user_id": row["user_id"],
+        "total_amount": float(row["total_amount"]),
+        "total_amount_usd": _float(row["total_amount_usd"]),
+        "status": row["status"],
+        "created_at": datetime.fromisoformat(row["created_at"]),
+        "items": [
+            {
+                "asin": item["asin"],
+                "quantity": item["quantity"],
+                "price": float(item["price"]),
+                "title": item["title"],
+                "image_url": item.get("image_url"),
+                "product_link": item.get("product_link"),
+                "variant_asin": item.get("variant_asin"),
+                "variant_dimensions": item.get("variant_dimensions"),
+            }
+            for item in row["order_items"]
+        ],
+        "full_name": row["full_name"],
+        "street": row["street"],
+        "postal_code": row["postal_code"],
+        "phone": row["phone"],
+        "delivery_instructions": row["delivery_instructions"],
+        "shipping_guide": (
+            shipping_guide if shipping_guide is not None else PENDING_SHIPPING_GUIDE
+        ),
+        "blockchain_order_id": row.get("blockchain_order_id"),
+    }
+
+
+async def iter_orders(db, page_size: int = MAX_PAGE_SIZE, **filters):
+    cursor = None
+    while True:
+        rows, cursor = await fetch_orders_page(
+            db, cursor=cursor, limit=page_size, **filters
+        )
+        for row in rows:
+            yield row
+        if cursor is None:
+            break
@@ -1,10 +1,93 @@
-import os
+import asyncio
+from typing import Optional, Union
 
-from dotenv import load_dotenv
-from supabase import Client, create_client
+import httpx
+from postgrest import AsyncPostgrestClient
 
-load_dotenv()
+from config import settings
+from utils.metrics import instrumented_transport
 
-url: str = os.environ["SUPABASE_URL"]
-key: str = os.environ["SUPABASE_KEY"]
-supabase: Client = create_client(url, key)
+
+class _PooledPostgrestClient(AsyncPostgrestClient):
+    def __init__(self, base_url: str, pool_size: int, **kwargs):
+        self.pool_size = pool_size
+        super().__init__(base_url, **kwargs)
+
+    def create_session(
+        self,
+        base_url: str,
+        headers: dict,
+        timeout: Union[int, float, httpx.Timeout],
+        verify: bool = True,
+        proxy: Optional[str] = None,
+    ) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            follow_redirects=True,
+            transport=instrumented_transport(
+                "supabase",
+                verify=verify,
+                proxy=proxy,
+                http2=True,
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size,
+                ),
+            ),
+        )
+
+
+class Database:
+    def __init__(
+        self,
+        url: Optional[str],
+        key: Optional[str],
+        pool_size: int = settings.db_pool_size,
+        timeout: float = settings.db_query_timeout,
+    ):
+        self.url = url
+        self.key = key
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._client: Optional[_PooledPostgrestClient] = None
+
+    # Built on first use rather than at import, so each forked worker opens
+    # its own connection pool inside its own event loop.
+    @property
+    def client(self) -> _PooledPostgrestClient:
+        if self._client is None:
+            self._client = _PooledPostgrestClient(
+                f"{self.url}/rest/v1",
+                self.pool_size,
+                headers={
+                    "apiKey": self.key,
+                    "Authorization": f"Bearer {self.key}",
+                    "Accept": "application/json",
+                    "Content-Type": "application/json",
+                },
+                timeout=self.timeout,
+            )
+        return self._client
+
+    def table(self, name: str):
+        return self.client.from_(name)
+
+    def rpc(self, fn: str, params: dict = None):
+        return self.client.rpc(fn, params or {})
+
+    async def execute(self, query):
+        return await asyncio.wait_for(query.execute(), self.timeout)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+db = Database(settings.supabase_url, settings.supabase_key)
+
+
+def get_db() -> Database:
+    return db
@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import time
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+
+import httpx
+
+from config import settings
+from exchange.store import RateStore
+from utils.metrics import instrumented_transport
+from utils.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+# Banxico answered, but not with the payload this client expects.
+class BanxicoError(Exception):
+    pass
+
+
+def parse_datos(datos: list) -> List[Tuple[date, str]]:
+    rows = []
+    for dato in datos:
+        value = dato.get("dato")
+        # Banxico reports missing observations as "N/E".
+        if not value or value == "N/E":
+            continue
+        rows.append((datetime.strptime(dato["fecha"], "%d/%m/%Y").date(), value))
+    return rows
+
+
+def format_fecha(day: date) -> str:
+    return day.strftime("%d/%m/%Y")
+
+
+class ExchangeRateService:
+    def __init__(
+        self,
+        token: Optional[str] = settings.bmx_token,
+        series: str = settings.exchange_rate_series,
+        db_path: str = settings.exchange_rate_db_path,
+        refresh_interval: float = settings.exchange_rate_refresh_interval,
+        retry_interval: float = settings.exchange_rate_retry_interval,
+    ):
+        self.token = token
+        self.series = series
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self.store = RateStore(db_path)
+        self.title: Optional[str] = None
+        self.current: Optional[Tuple[date, str]] = None
+        self.refreshed_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._flight = SingleFlight()
+        self._coverage_lock = asyncio.Lock()
+        self._task = None
+
+    async def open(self):
+        self._client = httpx.AsyncClient(
+            base_url=settings.banxico_api_url,
+            headers={
+                "Accept": "application/json",
+                "Bmx-Token": self.token or "",
+                "Accept-Encoding": "gzip",
+            },
+            timeout=10.0,
+            transport=instrumented_transport("banxico"),
+        )
+        await self.store.open()
+        latest = await self.store.latest(self.series)
+        if latest is not None:
+            day, value, self.title = latest
+            self.current = (day, value)
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+        await self.store.close()
+
+    async def latest(self) -> Tuple[date, str]:
+        if self.current is None:
+            await self.refresh()
+        if self.current is None:
+            raise LookupError("No exchange rate available")
+        return self.current
+
+    async def refresh(self) -> bool:
+        return await self._flight.do("latest", self._refresh)
+
+    async def history(self, start: date, end: date) -> List[Tuple[date, str]]:
+        async with self._coverage_lock:
+            await self._ensure_coverage(start, end)
+        return await self.store.history(self.series, start, end)
+
+    def stats(self) -> dict:
+        return {
+            "series": self.series,
+            "fecha": format_fecha(self.current[0]) if self.current else None,
+            "valor": self.current[1] if self.current else None,
+            "age_seconds": (
+                round(time.monotonic() - self.refreshed_at, 1)
+                if self.refreshed_at
+                else None
+            ),
+            "last_error": self.last_error,
+        }
+
+    async def _refresh(self) -> bool:
+        try:
+            serie = await self._fetch(f"/series/{self.series}/datos/oportuno")
+            rows = parse_datos(serie.get("datos", []))
+            if not rows:
+                raise LookupError("No data found for the given series.")
+            self.title = serie.get("titulo") or self.title
+            await self.store.save(self.series, self.title, rows)
+        except Exception as e:
+            # Keep serving the last known good value.
+            self.last_error = str(e) or type(e).__name__
+            logger.warning(f"Error refreshing exchange rate: {self.last_error}")
+            return False
+        self.current = max(rows)
+        self.refreshed_at = time.monotonic()
+        self.last_error = None
+        return True
+
+    async def _ensure_coverage(self, start: date, end: date):
+        # Fetch only the gaps inside the requested range that were never asked
+        # of Banxico before, so a request never reaches beyond its own dates.
+        # Days after the covered ranges are kept up to date by the refresh loop.
+        end = min(end, date.today())
+        if start > end:
+            return
+        gaps = []
+        cursor = start
+        for covered_from, covered_to in await self.store.coverage(self.series):
+            if covered_to < cursor:
+                continue
+            if covered_from > end:
+                break
+            if covered_from > cursor:
+                gaps.append((cursor, covered_from - timedelta(days=1)))
+            cursor = covered_to + timedelta(days=1)
+        if cursor <= end:
+            gaps.append((cursor, end))
+        for gap_start, gap_end in gaps:
+            await self._backfill(gap_start, gap_end)
+        if gaps:
+            await self.store.add_coverage(self.series, start, end)
+
+    async def _backfill(self, start: date, end: date):
+        serie = await self._fetch(
+            f"/series/{self.series}/datos/{start.isoformat()}/{end.isoformat()}"
+        )
+        try:
+            rows = parse_datos(serie.get("datos", []))
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            raise BanxicoError(f"Malformed Banxico data: {e!r}")
+        self.title = serie.get("titulo") or self.title
+        await self.store.save(self.series, self.title, rows)
+
+    async def _fetch(self, path: str) -> dict:
+        response = await self._client.get(path)
+        response.raise_for_status()
+        try:
+            serie = response.json()["bmx"]["series"][0]
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            raise BanxicoError(f"Malformed Banxico response: {e!r}")
+        if not isinstance(serie, dict):
+            raise BanxicoError("Malformed Banxico response: series is not an object")
+        return serie
+
+    async def _run(self):
+        while True:
+            ok = await self.refresh()
+            await asyncio.sleep(
+                self.refresh_interval
+                if ok
+                else min(self.retry_interval, self.refresh_interval)
+            )
@@ -0,0 +1,143 @@
+import asyncio
+import sqlite3
+import threading
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+
+SCHEMA = """
+create table if not exists rates (
+    series text not null,
+    day text not null,
+    value text not null,
+    title text,
+    fetched_at text not null default (datetime('now')),
+    primary key (series, day)
+);
+create table if not exists coverage_ranges (
+    series text not null,
+    covered_from text not null,
+    covered_to text not null,
+    primary key (series, covered_from)
+);
+"""
+
+
+# Local time series of exchange rates. The newest row doubles as the last
+# known good value when Banxico is unreachable.
+class RateStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    async def open(self):
+        await asyncio.to_thread(self._open)
+
+    async def close(self):
+        if self._conn is not None:
+            await asyncio.to_thread(self._conn.close)
+            self._conn = None
+
+    async def save(
+        self, series: str, title: Optional[str], rows: List[Tuple[date, str]]
+    ):
+        await asyncio.to_thread(self._save, series, title, rows)
+
+    async def latest(self, series: str) -> Optional[Tuple[date, str, Optional[str]]]:
+        row = await asyncio.to_thread(
+            self._query_one,
+            "select day, value, title from rates where series = ? "
+            "order by day desc limit 1",
+            (series,),
+        )
+        if row is None:
+            return None
+        return date.fromisoformat(row[0]), row[1], row[2]
+
+    async def history(
+        self, series: str, start: date, end: date
+    ) -> List[Tuple[date, str]]:
+        rows = await asyncio.to_thread(
+            self._query,
+            "select day, value from rates where series = ? and day between ? and ? "
+            "order by day",
+            (series, start.isoformat(), end.isoformat()),
+        )
+        return [(date.fromisoformat(day), value) for day, value in rows]
+
+    # The disjoint date ranges already fetched in full from Banxico, in order.
+    async def coverage(self, series: str) -> List[Tuple[date, date]]:
+        rows = await asyncio.to_thread(
+            self._query,
+            "select covered_from, covered_to from coverage_ranges where series = ? "
+            "order by covered_from",
+            (series,),
+        )
+        return [
+            (date.fromisoformat(start), date.fromisoformat(end)) for start, end in rows
+        ]
+
+    # Records start..end as covered, merged with any range it overlaps or
+    # touches.
+    async def add_coverage(self, series: str, start: date, end: date):
+        await asyncio.to_thread(self._add_coverage, series, start, end)
+
+    def _open(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+            # Databases from before coverage_ranges kept a single range.
+            legacy = self._conn.execute(
+                "select 1 from sqlite_master where type = 'table' and name = 'coverage'"
+            ).fetchone()
+            if legacy:
+                self._conn.execute(
+                    "insert or ignore into coverage_ranges "
+                    "select series, covered_from, covered_to from coverage"
+                )
+                self._conn.execute("drop table coverage")
+
+    def _add_coverage(self, series: str, start: date, end: date):
+        with self._lock, self._conn:
+            touching = self._conn.execute(
+                "select covered_from, covered_to from coverage_ranges "
+                "where series = ? and covered_from <= ? and covered_to >= ?",
+                (
+                    series,
+                    (end + timedelta(days=1)).isoformat(),
+                    (start - timedelta(days=1)).isoformat(),
+                ),
+            ).fetchall()
+            for covered_from, covered_to in touching:
+                start = min(start, date.fromisoformat(covered_from))
+                end = max(end, date.fromisoformat(covered_to))
+            self._conn.executemany(
+                "delete from coverage_ranges where series = ? and covered_from = ?",
+                [(series, covered_from) for covered_from, _ in touching],
+            )
+            self._conn.execute(
+                "insert into coverage_ranges (series, covered_from, covered_to) "
+                "values (?, ?, ?)",
+                (series, start.isoformat(), end.isoformat()),
+            )
+
+    def _save(self, series: str, title: Optional[str], rows: List[Tuple[date, str]]):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "insert into rates (series, day, value, title) values (?, ?, ?, ?) "
+                "on conflict (series, day) do update set value = excluded.value, "
+                "title = excluded.title, fetched_at = excluded.fetched_at",
+                [(series, day.isoformat(), value, title) for day, value in rows],
+            )
+
+    def _write(self, sql: str, params: tuple):
+        with self._lock, self._conn:
+            self._conn.execute(sql, params)
+
+    def _query(self, sql: str, params: tuple) -> list:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _query_one(self, sql: str, params: tuple):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
@@ -1,25 +1,59 @@
+import hashlib
+import json
 import logging
-import os
+from contextlib import asynccontextmanager
+from datetime import date, datetime
 from typing import List, Optional
 
 import httpx
 import jwt
-from dotenv import load_dotenv
-from fastapi import Depends, FastAPI, HTTPException, status
+from fastapi import (
+    BackgroundTasks,
+    Depends,
+    FastAPI,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jwt import PyJWTError
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from pydantic import EmailStr
-from telegram import Bot
-from telegram.error import TelegramError
 
 from aiService.aiService import AIClass
-from amazon.amazon_api import get_product_details, search_products
-from amazon.shippingFees import calculate_shipping_fee, convert_to_pounds
-from database.supabase_client import supabase
-from mail.mail import send_email
+from aiService.backfill import backfill_cart_items
+from aiService.categories import CategoryStore
+from aiService.enrichment import EnrichmentStore
+from amazon import amazon_api, shipping_quote
+from amazon.amazon_api import get_product_details, search_products_dump
+from amazon.cache import MemoryBackend, TTLCache
+from amazon.compact import compact_search, parse_product_fields
+from amazon.shippingFees import calculate_shipping_fee
+from config import settings
+from database.cart_cache import CartCache, CartEntry
+from database.export import csv_lines, encode_chunks, ndjson_lines
+from database.orders import (
+    MAX_PAGE_SIZE,
+    fetch_orders_page,
+    iter_orders,
+    order_to_dict,
+    parse_fields,
+    project_order,
+)
+from database.supabase_client import Database, get_db
+from exchange.banxico import BanxicoError, ExchangeRateService, format_fecha
+from notifications.outbox import OutboxWorker
+from notifications.senders import build_senders
 from schemas.schemas import (
+    BulkShipRequest,
+    BulkShipResponse,
     Cart,
+    CartDelta,
     CartItem,
     CreateOrderRequest,
     Order,
@@ -28,23 +62,45 @@ from schemas.schemas import (
     ProductDetailResponse,
     SearchRequest,
     SearchResponse,
+    ShipmentResult,
+    ShippingQuoteItem,
+    ShippingQuoteRequest,
+    ShippingQuoteResponse,
     StatsResponse,
     UpdateOrderStatusRequest,
     UserData,
 )
+from utils.metrics import metrics_middleware, stats_collector
+from utils.responses import LeanJSONResponse, compressed_json
+
+MAX_EXCHANGE_RATE_HISTORY_DAYS = 3660
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Fail at startup, not import, so tooling can import the app without a
+    # full environment.
+    settings.require(
+        "supabase_url", "supabase_key", "api_key", "api_url", "api_key_openai"
+    )
+    await amazon_api.open_client()
+    await category_store.load()
+    await exchange_rates.open()
+    # NOTIFICATION_WORKERS=0 leaves delivery to `python -m notifications.outbox`.
+    if settings.notification_workers:
+        await outbox_worker.start()
+    try:
+        yield
+    finally:
+        if settings.notification_workers:
+            await outbox_worker.stop()
+        await amazon_api.close_client()
+        await exchange_rates.close()
+        await ai_service.aclose()
+        await get_db().aclose()
 
-load_dotenv()
-
-TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
-ADMIN_WALLET_ADDRESS = os.getenv("ADMIN_WALLET_ADDRESS")
-ADMIN_PRIVY_ID = os.getenv("ADMIN_PRIVY_ID")
-BMX_TOKEN = os.getenv("BMX_TOKEN")
-API_KEY_OPENAI = os.getenv("API_KEY_OPENAI", "")
-if not API_KEY_OPENAI:
-    raise ValueError("API_KEY_OPENAI environment variable is required")
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 security = HTTPBearer()
 
@@ -54,13 +110,79 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
+app.middleware("http")(metrics_middleware)
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 logger.info("Starting application")
-ai_service = AIClass(api_key=API_KEY_OPENAI, model="gpt-4o-mini")
+category_store = CategoryStore(
+    get_db(), min_score=settings.category_classifier_min_score
+)
+ai_service = AIClass(
+    api_key=settings.api_key_openai,
+    model="gpt-4o-mini",
+    category_store=category_store,
+    weight_min_confidence=settings.weight_parser_min_confidence,
+    max_concurrency=settings.ai_max_concurrency,
+    timeout=settings.ai_timeout,
+)
+enrichment_store = EnrichmentStore(get_db(), ai_service)
+cart_cache = CartCache(
+    ttl=(
+        settings.cart_cache_ttl
+        if settings.cart_cache_ttl is not None
+        else 15 if settings.web_concurrency <= 1 else 0
+    )
+)
+stats_cache = TTLCache(
+    MemoryBackend(1024**2), settings.stats_cache_ttl, settings.stats_cache_ttl
+)
+exchange_rates = ExchangeRateService()
+outbox_worker = OutboxWorker(
+    get_db(), build_senders(), workers=settings.notification_workers
+)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    usage = ai_service.usage_stats()
+    notifications = outbox_worker.stats()
+    stats_collector.update(
+        caches={
+            **{
+                name: stats
+                for name, stats in (await amazon_api.cache_stats()).items()
+                if isinstance(stats, dict)
+            },
+            "stats": await stats_cache.stats(),
+        },
+        flights={
+            **amazon_api.singleflight_stats(),
+            **ai_service.singleflight_stats(),
+        },
+        counters={
+            "openai_requests": ("OpenAI API requests", {"all": usage["requests"]}),
+            "openai_tokens": (
+                "OpenAI tokens used",
+                {
+                    "prompt": usage["prompt_tokens"],
+                    "completion": usage["completion_tokens"],
+                },
+            ),
+            "notifications": (
+                "Outbox notifications by outcome",
+                {
+                    outcome: notifications[outcome]
+                    for outcome in ("sent", "retried", "dead")
+                },
+            ),
+        },
+    )
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 
 @app.get("/")
@@ -82,7 +204,10 @@ def verify_admin_token(credentials: HTTPAuthorizationCredentials = Depends(secur
                 status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token"
             )
 
-        if privy_id != ADMIN_PRIVY_ID and wallet_address != ADMIN_WALLET_ADDRESS:
+        if (
+            privy_id != settings.admin_privy_id
+            and wallet_address != settings.admin_wallet_address
+        ):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized"
             )
@@ -94,35 +219,78 @@ def verify_admin_token(credentials: HTTPAuthorizationCredentials = Depends(secur
         )
 
 
-async def send_telegram_notification(message: str):
-    bot = Bot(token=TELEGRAM_BOT_TOKEN)
+@app.post("/api/searchProduct", response_model=SearchResponse)
+async def search_product_endpoint(
+    request: SearchRequest, accept_encoding: Optional[str] = Header(None)
+):
+    try:
+        fields = parse_product_fields(request.fields, request.compact)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     try:
-        await bot.send_message(chat_id=TELEGRAM_CHAT_ID, text=message)
-    except TelegramError as e:
-        print(f"Error sending Telegram notification: {e}")
+        dump = await search_products_dump(request.query)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return compressed_json(
+        compact_search(dump, fields, request.limit, request.image_width),
+        accept_encoding,
+    )
 
 
-@app.post("/api/searchProduct", response_model=SearchResponse)
-async def search_product_endpoint(request: SearchRequest):
+@app.post("/api/productDetails", response_model=ProductDetailResponse)
+async def product_details_endpoint(
+    request: ProductDetailRequest, background_tasks: BackgroundTasks
+):
     try:
-        return search_products(request.query)
+        response = await get_product_details(request.asin)
+        if settings.enrich_on_product_details:
+            background_tasks.add_task(enrichment_store.enrich_product, response.product)
+        return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/api/productDetails", response_model=ProductDetailResponse)
-async def product_details_endpoint(request: ProductDetailRequest):
+@app.get("/api/admin/cache/stats")
+async def get_cache_stats(admin_id: str = Depends(verify_admin_token)):
+    return await amazon_api.cache_stats()
+
+
+@app.get("/api/admin/singleflight/stats")
+async def get_singleflight_stats(admin_id: str = Depends(verify_admin_token)):
+    return {**amazon_api.singleflight_stats(), **ai_service.singleflight_stats()}
+
+
+@app.get("/api/admin/categories/stats")
+async def get_category_stats(admin_id: str = Depends(verify_admin_token)):
+    return category_store.stats()
+
+
+@app.get("/api/admin/notifications/stats")
+async def get_notification_stats(admin_id: str = Depends(verify_admin_token)):
+    return outbox_worker.stats()
+
+
+@app.post("/api/admin/backfill/cart-items")
+async def backfill_cart_items_endpoint(
+    chunk_size: int = Query(50, ge=1),
+    concurrency: int = Query(4, ge=1),
+    limit: int = Query(500, ge=1),
+    db: Database = Depends(get_db),
+    admin_id: str = Depends(verify_admin_token),
+):
     try:
-        return get_product_details(request.asin)
+        return await backfill_cart_items(db, ai_service, chunk_size, concurrency, limit)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/user/check")
-async def check_user_registration(privy_id: str, wallet_address: Optional[str] = None):
+async def check_user_registration(
+    privy_id: str, wallet_address: Optional[str] = None, db: Database = Depends(get_db)
+):
     try:
-        response = (
-            supabase.table("users").select("*").eq("privy_id", privy_id).execute()
+        response = await db.execute(
+            db.table("users").select("*").eq("privy_id", privy_id)
         )
         is_registered = len(response.data) > 0
         return {"isRegistered": is_registered}
@@ -131,9 +299,9 @@ async def check_user_registration(privy_id: str, wallet_address: Optional[str] =
 
 
 @app.post("/user")
-async def register_user(user_data: UserData):
+async def register_user(user_data: UserData, db: Database = Depends(get_db)):
     try:
-        response = supabase.table("users").insert(user_data.dict()).execute()
+        response = await db.execute(db.table("users").insert(user_data.dict()))
         if len(response.data) > 0:
             return response.data[0]
         else:
@@ -142,344 +310,331 @@ async def register_user(user_data: UserData):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _load_cart(user_id: str, db: Database) -> CartEntry:
+    entry = cart_cache.get(user_id)
+    if entry is None:
+        token = cart_cache.read_token()
+        result = await db.execute(
+            db.table("cart_items").select("*").eq("user_id", user_id)
+        )
+        entry = cart_cache.load(user_id, result.data, token)
+    return entry
+
+
+def _cart_response(entry: CartEntry, response: Response) -> Cart:
+    response.headers["ETag"] = entry.etag
+    return Cart(items=entry.rows())
+
+
+async def _delete_cart_item(user_id: str, asin: str, db: Database) -> CartEntry:
+    await db.execute(
+        db.table("cart_items").delete().eq("user_id", user_id).eq("asin", asin)
+    )
+    return cart_cache.remove(user_id, asin) or await _load_cart(user_id, db)
+
+
 @app.get("/cart/{user_id}", response_model=Cart)
-async def get_cart(user_id: str):
+async def get_cart(
+    user_id: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Database = Depends(get_db),
+):
     try:
-        response = (
-            supabase.table("cart_items").select("*").eq("user_id", user_id).execute()
-        )
-        return Cart(items=response.data)
+        entry = await _load_cart(user_id, db)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if cart_cache.parse_etag(if_none_match) == entry.version:
+        return Response(status_code=304, headers={"ETag": entry.etag})
+    return _cart_response(entry, response)
 
 
-@app.post("/cart/{user_id}", response_model=Cart)
-async def add_to_cart(user_id: str, item: CartItem):
+@app.get("/cart/{user_id}/delta", response_model=CartDelta)
+async def get_cart_delta(
+    user_id: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Database = Depends(get_db),
+):
     try:
-        category_result = await ai_service.normalize_category_fn(item.category)
-        if not category_result or not category_result.get("prediction"):
-            raise HTTPException(
-                status_code=400, detail="Could not determine product category"
-            )
+        entry = await _load_cart(user_id, db)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        normalized_category = category_result["prediction"]
+    since = cart_cache.parse_etag(if_none_match)
+    if since == entry.version:
+        return Response(status_code=304, headers={"ETag": entry.etag})
+
+    response.headers["ETag"] = entry.etag
+    delta = entry.delta(since) if since is not None else None
+    if delta is None:
+        return CartDelta(version=entry.etag, items=entry.rows(), full=True)
+    items, removed = delta
+    return CartDelta(version=entry.etag, items=items, removed=removed, full=False)
 
-        weight_result = await ai_service.extract_weight_fn(item.specifications)
-        weight_lb = convert_to_pounds(
-            weight_result["weight_value"], weight_result["weight_unit"]
-        )
 
-        shipping_fee = calculate_shipping_fee(normalized_category, weight_lb)
-        response = (
-            supabase.table("cart_items")
-            .insert(
+@app.post("/cart/{user_id}", response_model=Cart)
+async def add_to_cart(
+    user_id: str, item: CartItem, response: Response, db: Database = Depends(get_db)
+):
+    try:
+        enrichment = await enrichment_store.get_or_enrich(
+            [item.variant_asin, item.asin], item.category, item.specifications
+        )
+        result = await db.execute(
+            db.rpc(
+                "add_cart_item",
                 {
-                    "user_id": user_id,
-                    "asin": item.asin,
-                    "quantity": item.quantity,
-                    "title": item.title,
-                    "price": item.price,
-                    "image_url": item.image_url,
-                    "product_link": item.product_link,
-                    "variant_asin": item.variant_asin,
-                    "variant_dimensions": item.variant_dimensions,
-                    "category": item.category,
-                    "specifications": item.specifications,
-                    "shipping_fee": shipping_fee,
-                    "normalized_category": normalized_category,
-                    "weight_lb": weight_lb,
-                }
+                    "item": {
+                        "user_id": user_id,
+                        "asin": item.asin,
+                        "quantity": item.quantity,
+                        "title": item.title,
+                        "price": item.price,
+                        "image_url": item.image_url,
+                        "product_link": item.product_link,
+                        "variant_asin": item.variant_asin,
+                        "variant_dimensions": item.variant_dimensions,
+                        "category": item.category,
+                        "specifications": item.specifications,
+                        "shipping_fee": calculate_shipping_fee(
+                            enrichment["normalized_category"], enrichment["weight_lb"]
+                        ),
+                        "normalized_category": enrichment["normalized_category"],
+                        "weight_lb": enrichment["weight_lb"],
+                    }
+                },
             )
-            .execute()
         )
-
-        if not response.data:
-            supabase.table("cart_items").update(
-                {"quantity": supabase.raw(f"quantity + {item.quantity}")}
-            ).eq("user_id", user_id).eq("asin", item.asin).execute()
-
-        return await get_cart(user_id)
+        entry = cart_cache.upsert(user_id, result.data) or await _load_cart(user_id, db)
+        return _cart_response(entry, response)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.delete("/cart/{user_id}/{asin}", response_model=Cart)
-async def remove_from_cart(user_id: str, asin: str):
+async def remove_from_cart(
+    user_id: str, asin: str, response: Response, db: Database = Depends(get_db)
+):
     try:
-        supabase.table("cart_items").delete().eq("user_id", user_id).eq(
-            "asin", asin
-        ).execute()
-        return await get_cart(user_id)
+        entry = await _delete_cart_item(user_id, asin, db)
+        return _cart_response(entry, response)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.put("/cart/{user_id}/{asin}", response_model=Cart)
-async def update_cart_item_quantity(user_id: str, asin: str, quantity: int):
+async def update_cart_item_quantity(
+    user_id: str,
+    asin: str,
+    quantity: int,
+    response: Response,
+    db: Database = Depends(get_db),
+):
     try:
         if quantity > 0:
-            supabase.table("cart_items").update({"quantity": quantity}).eq(
-                "user_id", user_id
-            ).eq("asin", asin).execute()
+            result = await db.execute(
+                db.table("cart_items")
+                .update({"quantity": quantity})
+                .eq("user_id", user_id)
+                .eq("asin", asin)
+            )
+            entry = cart_cache.upsert(user_id, result.data) or await _load_cart(
+                user_id, db
+            )
         else:
-            await remove_from_cart(user_id, asin)
-        return await get_cart(user_id)
+            entry = await _delete_cart_item(user_id, asin, db)
+        return _cart_response(entry, response)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/api/orders", response_model=Order)
-async def create_order(order_details: CreateOrderRequest):
+async def create_order(
+    order_details: CreateOrderRequest, db: Database = Depends(get_db)
+):
     try:
-        order_response = (
-            supabase.table("orders")
-            .insert(
+        order_response = await db.execute(
+            db.rpc(
+                "create_order",
                 {
-                    "user_id": order_details.user_id,
-                    "total_amount": order_details.total_amount,
-                    "total_amount_usd": order_details.total_amount_usd,
-                    "status": "order received",
-                    "full_name": order_details.full_name,
-                    "street": order_details.street,
-                    "postal_code": order_details.postal_code,
-                    "phone": order_details.phone,
-                    "delivery_instructions": order_details.delivery_instructions,
-                    "shipping_guide": None,
-                    "blockchain_order_id": str(order_details.blockchain_order_id),
-                }
+                    "order_data": {
+                        "user_id": order_details.user_id,
+                        "total_amount": order_details.total_amount,
+                        "total_amount_usd": order_details.total_amount_usd,
+                        "status": "order received",
+                        "full_name": order_details.full_name,
+                        "street": order_details.street,
+                        "postal_code": order_details.postal_code,
+                        "phone": order_details.phone,
+                        "delivery_instructions": order_details.delivery_instructions,
+                        "shipping_guide": None,
+                        "blockchain_order_id": str(order_details.blockchain_order_id),
+                    },
+                    "items": [item.model_dump() for item in order_details.items],
+                },
             )
-            .execute()
         )
+        order_data = order_response.data
 
-        if not order_response.data:
+        if not order_data:
             raise HTTPException(status_code=500, detail="Failed to create order")
 
-        order_id = order_response.data[0]["id"]
-
-        order_items = [
-            {
-                "order_id": order_id,
-                "asin": item.asin,
-                "quantity": item.quantity,
-                "price": item.price,
-                "title": item.title,
-                "image_url": item.image_url,
-                "product_link": item.product_link,
-                "variant_asin": item.variant_asin,
-                "variant_dimensions": item.variant_dimensions,
-            }
-            for item in order_details.items
-        ]
-
-        supabase.table("order_items").insert(order_items).execute()
-
-        supabase.table("cart_items").delete().eq(
-            "user_id", order_details.user_id
-        ).execute()
-
-        notification_message = f"""
-        Nueva orden creada:
-        ID: {order_id}
-        Usuario: {order_details.user_id}
-        Monto total: {order_details.total_amount}
-        Monto total USD: {order_details.total_amount_usd}
-        """
-        await send_telegram_notification(notification_message)
-
-        order_data = (
-            supabase.table("orders")
-            .select("*, order_items(*)")
-            .eq("id", order_id)
-            .single()
-            .execute()
-        )
-
-        if not order_data.data:
-            raise HTTPException(
-                status_code=404, detail="Order not found after creation"
-            )
+        cart_cache.clear(order_details.user_id)
+        outbox_worker.wake()
 
         return Order(
-            id=order_data.data["id"],
-            user_id=order_data.data["user_id"],
-            total_amount=float(order_data.data["total_amount"]),
+            id=order_data["id"],
+            user_id=order_data["user_id"],
+            total_amount=float(order_data["total_amount"]),
             total_amount_usd=(
-                float(order_data.data["total_amount_usd"])
-                if order_data.data["total_amount_usd"] is not None
+                float(order_data["total_amount_usd"])
+                if order_data["total_amount_usd"] is not None
                 else None
             ),
-            status=order_data.data["status"],
-            created_at=order_data.data["created_at"],
-            items=[OrderItem(**item) for item in order_data.data["order_items"]],
-            full_name=order_data.data["full_name"],
-            street=order_data.data["street"],
-            postal_code=order_data.data["postal_code"],
-            phone=order_data.data["phone"],
-            delivery_instructions=order_data.data["delivery_instructions"],
-            shipping_guide=order_data.data.get("shipping_guide"),
-            blockchain_order_id=order_data.data["blockchain_order_id"],
+            status=order_data["status"],
+            created_at=order_data["created_at"],
+            items=[OrderItem(**item) for item in order_data["order_items"]],
+            full_name=order_data["full_name"],
+            street=order_data["street"],
+            postal_code=order_data["postal_code"],
+            phone=order_data["phone"],
+            delivery_instructions=order_data["delivery_instructions"],
+            shipping_guide=order_data.get("shipping_guide"),
+            blockchain_order_id=order_data["blockchain_order_id"],
         )
     except Exception as e:
-        print(f"Error creating order: {str(e)}")
-        print(f"Order details: {order_details}")
+        logger.error(f"Error creating order: {str(e)}")
+        logger.error(f"Order details: {order_details}")
         raise HTTPException(status_code=500, detail=f"Failed to create order: {str(e)}")
 
 
-@app.get("/api/orders/{user_id}", response_model=List[Order])
-async def get_user_orders(user_id: str):
+# Shared by the user and admin listings: one keyset page, projected to the
+# requested fields and encoded straight from the rows.
+async def _orders_page_response(
+    db: Database,
+    fields: Optional[str],
+    cursor: Optional[str],
+    limit: int,
+    **filters,
+) -> LeanJSONResponse:
     try:
-        orders_data = (
-            supabase.table("orders")
-            .select("*, order_items(*)")
-            .eq("user_id", user_id)
-            .execute()
+        projection = parse_fields(fields)
+        rows, next_cursor = await fetch_orders_page(
+            db, fields=projection, cursor=cursor, limit=limit, **filters
         )
-
-        orders = []
-        for order_data in orders_data.data:
-            order_items = [
-                OrderItem(
-                    asin=item["asin"],
-                    quantity=item["quantity"],
-                    price=item["price"],
-                    title=item["title"],
-                    image_url=item.get("image_url"),
-                    product_link=item["product_link"],
-                    variant_asin=item.get("variant_asin"),
-                    variant_dimensions=item.get("variant_dimensions"),
-                )
-                for item in order_data["order_items"]
-            ]
-
-            shipping_guide = order_data.get("shipping_guide")
-            if shipping_guide is None:
-                shipping_guide = "Generando orden de envío"
-
-            order = Order(
-                id=order_data["id"],
-                user_id=order_data["user_id"],
-                total_amount=order_data["total_amount"],
-                total_amount_usd=order_data["total_amount_usd"],
-                status=order_data["status"],
-                created_at=order_data["created_at"],
-                items=order_items,
-                full_name=order_data["full_name"],
-                street=order_data["street"],
-                postal_code=order_data["postal_code"],
-                phone=order_data["phone"],
-                delivery_instructions=order_data["delivery_instructions"],
-                shipping_guide=shipping_guide,
-            )
-            orders.append(order)
-
-        return orders
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        print(f"Error fetching orders: {str(e)}")
+        logger.error(f"Error fetching orders: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-
-@app.get("/api/admin/orders", response_model=List[Order])
-async def get_all_orders(admin_id: str = Depends(verify_admin_token)):
     try:
-        orders_data = supabase.table("orders").select("*, order_items(*)").execute()
-
-        orders = []
-        for order_data in orders_data.data:
-            order_items = [
-                OrderItem(
-                    asin=item["asin"],
-                    quantity=item["quantity"],
-                    price=item["price"],
-                    title=item["title"],
-                    image_url=item.get("image_url"),
-                    product_link=item.get("product_link", "https://www.amazon.com"),
-                    variant_asin=item.get("variant_asin"),
-                    variant_dimensions=item.get("variant_dimensions"),
-                )
-                for item in order_data["order_items"]
-            ]
-
-            order = Order(
-                id=order_data["id"],
-                user_id=order_data["user_id"],
-                total_amount=float(order_data["total_amount"]),
-                total_amount_usd=(
-                    float(order_data["total_amount_usd"])
-                    if order_data["total_amount_usd"] is not None
-                    else None
-                ),
-                status=order_data["status"],
-                created_at=order_data["created_at"],
-                items=order_items,
-                full_name=order_data["full_name"],
-                street=order_data["street"],
-                postal_code=order_data["postal_code"],
-                phone=order_data["phone"],
-                delivery_instructions=order_data["delivery_instructions"],
-                shipping_guide=order_data.get(
-                    "shipping_guide", "Generando orden de envío"
-                ),
-                blockchain_order_id=order_data.get("blockchain_order_id"),
-            )
-            orders.append(order)
-
-        return orders
+        if projection is not None:
+            content = [project_order(row, projection) for row in rows]
+        else:
+            content = [order_to_dict(row) for row in rows]
     except Exception as e:
-        print(f"Error fetching all orders: {str(e)}")
+        logger.error(f"Error serializing orders: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    return LeanJSONResponse(content, headers=headers)
+
+
+@app.get("/api/orders/{user_id}", response_model=List[Order])
+async def get_user_orders(
+    user_id: str,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    order_status: Optional[str] = Query(None, alias="status"),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    fields: Optional[str] = None,
+    db: Database = Depends(get_db),
+):
+    return await _orders_page_response(
+        db,
+        fields,
+        cursor,
+        limit,
+        user_id=user_id,
+        status=order_status,
+        date_from=date_from,
+        date_to=date_to,
+    )
+
+
+@app.get("/api/admin/orders", response_model=List[Order])
+async def get_all_orders(
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    order_status: Optional[str] = Query(None, alias="status"),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    fields: Optional[str] = None,
+    db: Database = Depends(get_db),
+    admin_id: str = Depends(verify_admin_token),
+):
+    return await _orders_page_response(
+        db,
+        fields,
+        cursor,
+        limit,
+        status=order_status,
+        date_from=date_from,
+        date_to=date_to,
+    )
+
+
+@app.get("/api/admin/orders/export")
+async def export_orders(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    gzip: bool = False,
+    order_status: Optional[str] = Query(None, alias="status"),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    page_size: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Database = Depends(get_db),
+    admin_id: str = Depends(verify_admin_token),
+):
+    # Pages are only fetched as the client consumes the stream, so memory use
+    # stays at about one page regardless of the export size.
+    rows = iter_orders(
+        db,
+        page_size=page_size,
+        status=order_status,
+        date_from=date_from,
+        date_to=date_to,
+    )
+    lines = ndjson_lines(rows) if format == "ndjson" else csv_lines(rows)
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    filename = f"orders.{format}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        encode_chunks(lines, compress=gzip), media_type=media_type, headers=headers
+    )
+
 
 @app.get("/api/orders_admin/{order_id}", response_model=Order)
-async def get_order_by_id(order_id: str, admin_id: str = Depends(verify_admin_token)):
+async def get_order_by_id(
+    order_id: str,
+    db: Database = Depends(get_db),
+    admin_id: str = Depends(verify_admin_token),
+):
     try:
-        order_data = (
-            supabase.table("orders")
-            .select("*, order_items(*)")
-            .eq("id", order_id)
-            .single()
-            .execute()
+        order_data = await db.execute(
+            db.table("orders").select("*, order_items(*)").eq("id", order_id).single()
         )
 
         if not order_data.data:
             raise HTTPException(status_code=404, detail="Order not found")
 
-        order_items = [
-            OrderItem(
-                asin=item["asin"],
-                quantity=item["quantity"],
-                price=item["price"],
-                title=item["title"],
-                image_url=item.get("image_url"),
-            )
-            for item in order_data.data["order_items"]
-        ]
-        shipping_guide = order_data.data.get("shipping_guide")
-        if shipping_guide is None:
-            shipping_guide = "Generando orden de envío"
-
-        order = Order(
-            id=order_data.data["id"],
-            user_id=order_data.data["user_id"],
-            total_amount=float(order_data.data["total_amount"]),
-            total_amount_usd=(
-                float(order_data.data["total_amount_usd"])
-                if order_data.data["total_amount_usd"] is not None
-                else None
-            ),
-            status=order_data.data["status"],
-            created_at=order_data.data["created_at"],
-            items=order_items,
-            full_name=order_data.data["full_name"],
-            street=order_data.data["street"],
-            postal_code=order_data.data["postal_code"],
-            phone=order_data.data["phone"],
-            delivery_instructions=order_data.data["delivery_instructions"],
-            shipping_guide=shipping_guide,
-            blockchain_order_id=order_data.data.get("blockchain_order_id"),
-        )
-        return order
+        return LeanJSONResponse(order_to_dict(order_data.data))
     except Exception as e:
-        print(f"Error fetching order: {str(e)}")
+        logger.error(f"Error fetching order: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -487,137 +642,212 @@ async def get_order_by_id(order_id: str, admin_id: str = Depends(verify_admin_to
 async def update_order_status(
     order_id: str,
     request: UpdateOrderStatusRequest,
+    db: Database = Depends(get_db),
     admin_id: str = Depends(verify_admin_token),
 ):
     try:
-        order_info = (
-            supabase.table("orders").select("*").eq("id", order_id).single().execute()
-        )
-        if not order_info.data:
-            raise HTTPException(status_code=404, detail="Order not found")
-
-        response = (
-            supabase.table("orders")
-            .update({"status": "shipped", "shipping_guide": request.shippingGuide})
-            .eq("id", order_id)
-            .execute()
+        response = await db.execute(
+            db.rpc(
+                "ship_order",
+                {"p_order_id": order_id, "p_shipping_guide": request.shippingGuide},
+            )
         )
-
         if not response.data:
-            raise HTTPException(
-                status_code=404, detail="Order not found or no update made"
-            )
-
-        if response.data[0]["status"] == "shipped":
-            user_id = order_info.data["user_id"]
-            user_info = (
-                supabase.table("users")
-                .select("email")
-                .eq("privy_id", user_id)
-                .single()
-                .execute()
-            )
-
-            if user_info.data and user_info.data.get("email"):
-                user_email = user_info.data["email"]
-                subject = "Your order has been shipped"
-                html_content = f"""
-                <h1>Your order has been shipped!</h1>
-                <p>Order ID: {order_id}</p>
-                <p>Shipping Guide: {request.shippingGuide}</p>
-                <p>Thank you for your purchase!</p>
-                """
-                email_result = send_email(user_email, subject, html_content)
-                if not email_result["success"]:
-                    print(f"Failed to send email: {email_result['message']}")
-            else:
-                print(f"User email not found for user_id: {user_id}")
+            raise HTTPException(status_code=404, detail="Order not found")
+        outbox_worker.wake()
 
         return {"message": "Order status updated successfully"}
 
     except Exception as e:
-        print(f"Error updating order status: {str(e)}")
+        logger.error(f"Error updating order status: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/exchange-rate/latest")
-async def get_latest_exchange_rate():
-    try:
-        url = (
-            "https://www.banxico.org.mx/SieAPIRest/service/v1/"
-            "series/SF43718/datos/oportuno"
+@app.post("/api/admin/orders/ship", response_model=BulkShipResponse)
+async def ship_orders(
+    request: BulkShipRequest,
+    db: Database = Depends(get_db),
+    admin_id: str = Depends(verify_admin_token),
+):
+    if len(request.shipments) > settings.max_bulk_shipments:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.max_bulk_shipments} shipments per request",
         )
-
-        headers = {
-            "Accept": "application/json",
-            "Bmx-Token": BMX_TOKEN,
-            "Accept-Encoding": "gzip",
-        }
-
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-
-        data = response.json()
-
-        latest_data = data.get("bmx", {}).get("series", [{}])[0]
-
-        if not latest_data:
-            raise HTTPException(
-                status_code=404, detail="No data found for the given series."
+    try:
+        response = await db.execute(
+            db.rpc(
+                "ship_orders",
+                {
+                    "shipments": [
+                        {
+                            "id": shipment.order_id,
+                            "shipping_guide": shipment.shippingGuide,
+                        }
+                        for shipment in request.shipments
+                    ]
+                },
             )
+        )
+    except Exception as e:
+        logger.error(f"Error shipping orders: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        idSerie = latest_data.get("idSerie")
-        title = latest_data.get("titulo")
-        datos = latest_data.get("datos", [])
-
-        if not datos:
-            raise HTTPException(
-                status_code=404, detail="No data found for the given series."
-            )
+    results = [
+        ShipmentResult(
+            order_id=str(row["order_id"]),
+            status=row["status"],
+            email_queued=row["email_queued"],
+        )
+        for row in response.data or []
+    ]
+    if any(result.email_queued for result in results):
+        outbox_worker.wake()
+    shipped = sum(result.status == "shipped" for result in results)
+    return BulkShipResponse(
+        shipped=shipped, not_found=len(results) - shipped, results=results
+    )
+
+
+def _cached_json(request: Request, content: dict, max_age: float) -> Response:
+    body = json.dumps(content, separators=(",", ":")).encode("utf-8")
+    etag = f'W/"{hashlib.sha1(body).hexdigest()[:16]}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={int(max_age)}",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+@app.post("/api/shipping/quote", response_model=ShippingQuoteResponse)
+async def shipping_quote_endpoint(request: ShippingQuoteRequest):
+    if len(request.items) > settings.max_quote_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.max_quote_items} items per quote",
+        )
+    if (
+        request.rates_version
+        and request.rates_version not in shipping_quote.RATE_TABLES
+    ):
+        raise HTTPException(
+            status_code=404,
+            detail=f"Unknown shipping rates version {request.rates_version}",
+        )
 
-        latest_value = datos[0]
-        date = latest_value.get("fecha")
-        value = latest_value.get("dato")
+    table = shipping_quote.get_rate_table(request.rates_version)
+    result = table.quote(
+        [item.category for item in request.items],
+        [item.weight_lb for item in request.items],
+        [item.quantity for item in request.items],
+    )
+    return ShippingQuoteResponse(
+        rates_version=table.version,
+        items=[
+            ShippingQuoteItem(unit_fee=unit_fee, fee=fee)
+            for unit_fee, fee in zip(result["unit_fees"], result["fees"])
+        ],
+        total=result["total"],
+    )
+
+
+@app.get("/api/shipping/rates")
+async def get_shipping_rates(version: Optional[str] = None):
+    if version is None:
+        return {"versions": shipping_quote.rate_versions()}
+    if version not in shipping_quote.RATE_TABLES:
+        raise HTTPException(
+            status_code=404, detail=f"Unknown shipping rates version {version}"
+        )
+    return shipping_quote.RATE_TABLES[version].to_dict()
 
-        return {"idSerie": idSerie, "titulo": title, "fecha": date, "valor": value}
 
-    except httpx.RequestError as e:
+@app.get("/api/exchange-rate/latest")
+async def get_latest_exchange_rate(request: Request):
+    try:
+        day, value = await exchange_rates.latest()
+    except LookupError as e:
         raise HTTPException(status_code=503, detail=f"Banxico API error: {str(e)}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Internal error: {str(e)}")
-
 
-@app.get("/api/stats", response_model=StatsResponse)
-async def get_stats():
-    try:
-        users_response = (
-            supabase.table("users").select("count", count="exact").execute()
+    return _cached_json(
+        request,
+        {
+            "idSerie": exchange_rates.series,
+            "titulo": exchange_rates.title,
+            "fecha": format_fecha(day),
+            "valor": value,
+        },
+        settings.exchange_rate_max_age,
+    )
+
+
+@app.get("/api/exchange-rate/history")
+async def get_exchange_rate_history(
+    request: Request,
+    start: date,
+    end: Optional[date] = None,
+):
+    end = end or date.today()
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if (end - start).days > MAX_EXCHANGE_RATE_HISTORY_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_EXCHANGE_RATE_HISTORY_DAYS} days per request",
         )
-        total_users = users_response.count
+    try:
+        rows = await exchange_rates.history(start, end)
+    except (httpx.HTTPError, BanxicoError) as e:
+        raise HTTPException(status_code=503, detail=f"Banxico API error: {str(e)}")
 
-        orders_response = supabase.table("orders").select("total_amount").execute()
-        total_order_amount = sum(
-            float(order["total_amount"]) for order in orders_response.data
-        )
+    return _cached_json(
+        request,
+        {
+            "idSerie": exchange_rates.series,
+            "titulo": exchange_rates.title,
+            "datos": [
+                {"fecha": format_fecha(day), "valor": value} for day, value in rows
+            ],
+        },
+        settings.exchange_rate_max_age,
+    )
+
+
+@app.get("/api/admin/exchange-rate/stats")
+async def get_exchange_rate_stats(admin_id: str = Depends(verify_admin_token)):
+    return exchange_rates.stats()
+
+
+@app.get("/api/stats", response_model=StatsResponse, response_model_exclude_none=True)
+async def get_stats(
+    days: int = Query(0, ge=0, le=366),
+    breakdown: bool = False,
+    db: Database = Depends(get_db),
+):
+    async def fetch():
+        response = await db.execute(db.rpc("get_order_stats", {"days": days}))
+        return response.data
 
-        return StatsResponse(
-            total_users=total_users, total_order_amount=total_order_amount
-        )
+    try:
+        stats = await stats_cache.get_or_fetch(str(days), fetch)
+        if not breakdown and not days:
+            return StatsResponse(
+                total_users=stats["total_users"],
+                total_order_amount=stats["total_order_amount"],
+            )
+        return StatsResponse(**stats)
     except Exception as e:
         logger.error(f"Error fetching stats: {str(e)}")
         raise HTTPException(status_code=500, detail="Error fetching stats")
 
 
 @app.get("/user/email")
-async def get_user_email(privy_id: str):
+async def get_user_email(privy_id: str, db: Database = Depends(get_db)):
     try:
-        response = (
-            supabase.table("users")
-            .select("email")
-            .eq("privy_id", privy_id)
-            .single()
-            .execute()
+        response = await db.execute(
+            db.table("users").select("email").eq("privy_id", privy_id).single()
         )
         if response.data:
             return {"email": response.data.get("email")}
@@ -628,13 +858,12 @@ async def get_user_email(privy_id: str):
 
 
 @app.put("/user/email")
-async def update_user_email(privy_id: str, email: EmailStr):
+async def update_user_email(
+    privy_id: str, email: EmailStr, db: Database = Depends(get_db)
+):
     try:
-        response = (
-            supabase.table("users")
-            .update({"email": email})
-            .eq("privy_id", privy_id)
-            .execute()
+        response = await db.execute(
+            db.table("users").update({"email": email}).eq("privy_id", privy_id)
         )
         if len(response.data) > 0:
             return {"message": "Email updated successfully"}
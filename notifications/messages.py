@@ -0,0 +1,39 @@
+import os
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), "templates")
+
+_env = Environment(
+    loader=FileSystemLoader(TEMPLATES_DIR),
+    autoescape=select_autoescape(["html"]),
+)
+# Compiled once at import; rendering is then a plain function call.
+ORDER_SHIPPED_TEMPLATE = _env.get_template("order_shipped.html")
+
+
+def order_created(payload: dict) -> str:
+    return f"""
+        Nueva orden creada:
+        ID: {payload["order_id"]}
+        Usuario: {payload["user_id"]}
+        Monto total: {payload["total_amount"]}
+        Monto total USD: {payload["total_amount_usd"]}
+        """
+
+
+def order_shipped(payload: dict) -> dict:
+    return {
+        "to": payload["to"],
+        "subject": "Your order has been shipped",
+        "html": ORDER_SHIPPED_TEMPLATE.render(
+            order_id=payload["order_id"], shipping_guide=payload["shipping_guide"]
+        ),
+    }
+
+
+# Outbox event -> (channel, renderer producing the sender's message).
+MESSAGES = {
+    "order_created": ("telegram", order_created),
+    "order_shipped": ("email", order_shipped),
+}
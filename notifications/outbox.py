@@ -0,0 +1,285 @@
+"""Deliver queued notification_outbox events.
+
+Usage: python -m notifications.outbox [--workers N]
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from config import settings
+from notifications.messages import MESSAGES
+from notifications.senders import PermanentError, RetryLater
+from utils.ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Resend's batch endpoint takes at most 100 emails.
+NOTIFICATION_BATCH_LIMIT = 100
+NOTIFICATION_RATES = {
+    "telegram": settings.notification_telegram_rate,
+    "email": settings.notification_email_rate,
+}
+
+
+class OutboxWorker:
+    def __init__(
+        self,
+        client,
+        senders: dict,
+        workers: int = 4,
+        batch_size: int = 20,
+        poll_interval: float = 2.0,
+        lease_seconds: int = 60,
+        max_attempts: int = settings.notification_max_attempts,
+        base_delay: float = 2.0,
+        max_delay: float = 900.0,
+        rates: Optional[Dict[str, float]] = None,
+        table: str = "notification_outbox",
+    ):
+        self.client = client
+        self.senders = senders
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.table = table
+        self.limits = {
+            channel: TokenBucket(rate)
+            for channel, rate in (rates or NOTIFICATION_RATES).items()
+        }
+        self.sent = 0
+        self.retried = 0
+        self.dead = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._wake = asyncio.Event()
+        self._tasks = []
+
+    async def start(self):
+        for channel, sender in self.senders.items():
+            try:
+                await sender.open()
+            except Exception as e:
+                # Events for this channel fail and are retried with backoff;
+                # the worker, and the API that hosts it, still start.
+                logger.error(f"Error opening {channel} sender: {e}")
+        # Bounded so we never claim (and start the lease on) more events than
+        # the consumers can get to soon.
+        self._queue = asyncio.Queue(maxsize=self.batch_size)
+        self._tasks = [asyncio.create_task(self._poll())] + [
+            asyncio.create_task(self._consume()) for _ in range(self.workers)
+        ]
+
+    async def stop(self, drain_timeout: float = 5.0):
+        if self._tasks:
+            self._tasks[0].cancel()
+            try:
+                await asyncio.wait_for(self._queue.join(), drain_timeout)
+            except asyncio.TimeoutError:
+                # Whatever is left keeps its lease and is re-claimed later.
+                logger.warning(f"{self._queue.qsize()} notifications left in queue")
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            self._tasks = []
+        for sender in self.senders.values():
+            await sender.close()
+
+    def wake(self):
+        self._wake.set()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "sent": self.sent,
+            "retried": self.retried,
+            "dead": self.dead,
+        }
+
+    async def _poll(self):
+        while True:
+            try:
+                rows = (
+                    await self.client.execute(
+                        self.client.rpc(
+                            "claim_notifications",
+                            {
+                                "batch_size": self.batch_size,
+                                "lease_seconds": self.lease_seconds,
+                            },
+                        )
+                    )
+                ).data
+            except Exception as e:
+                logger.error(f"Error claiming notifications: {e}")
+                rows = []
+
+            for group in self._group(rows):
+                await self._queue.put(group)
+            if len(rows) == self.batch_size:
+                continue
+
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _group(self, rows: List[dict]) -> List[List[dict]]:
+        # Events for a sender with a batch API are sent together; everything
+        # else goes one by one.
+        groups = []
+        batches: Dict[str, List[dict]] = {}
+        for row in rows:
+            channel = MESSAGES.get(row["event"], (None, None))[0]
+            if hasattr(self.senders.get(channel), "send_batch"):
+                batch = batches.setdefault(channel, [])
+                batch.append(row)
+                if len(batch) == NOTIFICATION_BATCH_LIMIT:
+                    groups.append(batches.pop(channel))
+            else:
+                groups.append([row])
+        return groups + list(batches.values())
+
+    async def _consume(self):
+        while True:
+            rows = await self._queue.get()
+            try:
+                if len(rows) == 1:
+                    await self._deliver(rows[0])
+                else:
+                    await self._deliver_batch(rows)
+            except Exception as e:
+                ids = [row["id"] for row in rows]
+                logger.error(f"Error delivering notifications {ids}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, row: dict):
+        if row["event"] not in MESSAGES:
+            await self._dead_letter(row, f"Unknown event {row['event']}")
+            return
+        channel, render = MESSAGES[row["event"]]
+        sender = self.senders.get(channel)
+        if sender is None:
+            await self._dead_letter(row, f"No sender configured for {channel}")
+            return
+
+        if channel in self.limits:
+            await self.limits[channel].acquire()
+        try:
+            await sender.send(render(row["payload"]))
+        except PermanentError as e:
+            await self._dead_letter(row, str(e))
+        except RetryLater as e:
+            await self._retry(row, str(e), e.retry_after)
+        except Exception as e:
+            await self._retry(row, str(e) or type(e).__name__)
+        else:
+            await self._mark_sent([row])
+
+    async def _deliver_batch(self, rows: List[dict]):
+        channel, render = MESSAGES[rows[0]["event"]]
+        sender = self.senders[channel]
+
+        if channel in self.limits:
+            await self.limits[channel].acquire()
+        try:
+            await sender.send_batch([render(row["payload"]) for row in rows])
+        except PermanentError as e:
+            # Find the bad message(s) by sending individually.
+            logger.warning(f"Batch of {len(rows)} rejected, sending one by one: {e}")
+            for row in rows:
+                await self._deliver(row)
+        except RetryLater as e:
+            for row in rows:
+                await self._retry(row, str(e), e.retry_after)
+        except Exception as e:
+            for row in rows:
+                await self._retry(row, str(e) or type(e).__name__)
+        else:
+            await self._mark_sent(rows)
+
+    async def _mark_sent(self, rows: List[dict]):
+        self.sent += len(rows)
+        await self._update(
+            [row["id"] for row in rows],
+            {"status": "sent", "sent_at": _now().isoformat(), "last_error": None},
+        )
+
+    async def _retry(self, row: dict, error: str, delay: Optional[float] = None):
+        if row["attempts"] >= self.max_attempts:
+            await self._dead_letter(row, error)
+            return
+        if delay is None:
+            # Exponential backoff with full jitter.
+            delay = random.uniform(
+                0, min(self.max_delay, self.base_delay * 2 ** (row["attempts"] - 1))
+            )
+        self.retried += 1
+        logger.warning(
+            f"Notification {row['id']} attempt {row['attempts']} failed, "
+            f"retrying in {delay:.1f}s: {error}"
+        )
+        await self._update(
+            [row["id"]],
+            {
+                "status": "pending",
+                "available_at": (_now() + timedelta(seconds=delay)).isoformat(),
+                "locked_until": None,
+                "last_error": error,
+            },
+        )
+
+    async def _dead_letter(self, row: dict, error: str):
+        self.dead += 1
+        logger.error(f"Notification {row['id']} dead-lettered: {error}")
+        await self._update(
+            [row["id"]], {"status": "dead", "locked_until": None, "last_error": error}
+        )
+
+    async def _update(self, row_ids: list, values: dict):
+        try:
+            await self.client.execute(
+                self.client.table(self.table).update(values).in_("id", row_ids)
+            )
+        except Exception as e:
+            # The lease expires and the event is claimed again, so delivery is
+            # at-least-once.
+            logger.error(f"Error updating notifications {row_ids}: {e}")
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+async def _main(args):
+    from database.supabase_client import get_db
+    from notifications.senders import build_senders
+
+    settings.require("supabase_url", "supabase_key")
+    db = get_db()
+    worker = OutboxWorker(db, build_senders(), workers=args.workers)
+    await worker.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await worker.stop()
+        await db.aclose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    try:
+        asyncio.run(_main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
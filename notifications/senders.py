@@ -0,0 +1,129 @@
+from datetime import timedelta
+from typing import List, Optional
+
+import httpx
+
+from config import settings
+from utils.metrics import instrumented_transport, track
+
+
+# Raised when retrying cannot help (bad address, bot removed from chat...).
+class PermanentError(Exception):
+    pass
+
+
+class RetryLater(Exception):
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TelegramSender:
+    def __init__(self, token: str, chat_id: str):
+        self.token = token
+        self.chat_id = chat_id
+        self.bot = None
+        self._initialized = False
+
+    async def open(self):
+        # python-telegram-bot takes about as long to import as the rest of the
+        # app, so it is only loaded by processes that actually deliver.
+        from telegram import Bot
+
+        # No network here: initialize() calls getMe, and a Telegram outage
+        # must not keep the worker (or the API hosting it) from starting.
+        self.bot = Bot(token=self.token)
+        self._initialized = False
+
+    async def close(self):
+        if self.bot is not None:
+            await self.bot.shutdown()
+            self.bot = None
+
+    async def send(self, text: str):
+        from telegram.error import BadRequest, Forbidden, InvalidToken, RetryAfter
+
+        if self.bot is None:
+            await self.open()
+        try:
+            if not self._initialized:
+                # Failures here are retried like any failed send.
+                await self.bot.initialize()
+                self._initialized = True
+            async with track("telegram", "sendMessage"):
+                await self.bot.send_message(chat_id=self.chat_id, text=text)
+        except RetryAfter as e:
+            retry_after = e.retry_after
+            if isinstance(retry_after, timedelta):
+                retry_after = retry_after.total_seconds()
+            raise RetryLater(str(e), float(retry_after))
+        except (BadRequest, Forbidden, InvalidToken) as e:
+            raise PermanentError(str(e))
+
+
+class ResendSender:
+    def __init__(
+        self,
+        api_key: str,
+        sender: str = settings.email_from,
+        timeout: float = 10.0,
+    ):
+        self.api_key = api_key
+        self.sender = sender
+        self.timeout = timeout
+        self.client: Optional[httpx.AsyncClient] = None
+
+    async def open(self):
+        self.client = httpx.AsyncClient(
+            base_url=settings.resend_api_url,
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            timeout=self.timeout,
+            transport=instrumented_transport("resend"),
+        )
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def send(self, message: dict) -> str:
+        response = await self.client.post("/emails", json=self._email(message))
+        self._check(response)
+        return response.json()["id"]
+
+    async def send_batch(self, messages: List[dict]) -> List[str]:
+        # Resend validates the whole batch first: one bad message fails them all.
+        response = await self.client.post(
+            "/emails/batch", json=[self._email(message) for message in messages]
+        )
+        self._check(response)
+        return [email["id"] for email in response.json()["data"]]
+
+    def _email(self, message: dict) -> dict:
+        return {
+            "from": self.sender,
+            "to": [message["to"]],
+            "subject": message["subject"],
+            "html": message["html"],
+        }
+
+    def _check(self, response: httpx.Response):
+        if response.status_code == 429:
+            retry_after = response.headers.get("retry-after")
+            raise RetryLater(
+                "Resend rate limit", float(retry_after) if retry_after else None
+            )
+        if 400 <= response.status_code < 500:
+            raise PermanentError(f"Resend {response.status_code}: {response.text}")
+        response.raise_for_status()
+
+
+def build_senders() -> dict:
+    senders = {}
+    if settings.telegram_bot_token and settings.telegram_chat_id:
+        senders["telegram"] = TelegramSender(
+            settings.telegram_bot_token, settings.telegram_chat_id
+        )
+    if settings.resend_api_key:
+        senders["email"] = ResendSender(settings.resend_api_key)
+    return senders
@@ -1,11 +1,17 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import Dict, List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class SearchRequest(BaseModel):
     query: str
+    # compact=True or a field list returns only those Product fields.
+    compact: bool = False
+    fields: Optional[List[str]] = None
+    limit: Optional[int] = Field(None, ge=1, le=100)
+    # Thumbnails are rewritten to the nearest CDN variant for this width.
+    image_width: Optional[int] = Field(None, ge=1, le=2000)
 
 
 class ProductPrice(BaseModel):
@@ -86,6 +92,35 @@ class Cart(BaseModel):
     items: List[CartItem]
 
 
+class CartDelta(BaseModel):
+    version: str
+    items: List[CartItem]
+    removed: List[Dict[str, Optional[str]]] = []
+    full: bool
+
+
+class QuoteItem(BaseModel):
+    category: Optional[str] = None
+    weight_lb: float = Field(1.0, ge=0)
+    quantity: int = Field(1, ge=0)
+
+
+class ShippingQuoteRequest(BaseModel):
+    items: List[QuoteItem]
+    rates_version: Optional[str] = None
+
+
+class ShippingQuoteItem(BaseModel):
+    unit_fee: float
+    fee: float
+
+
+class ShippingQuoteResponse(BaseModel):
+    rates_version: str
+    items: List[ShippingQuoteItem]
+    total: float
+
+
 class OrderItem(BaseModel):
     asin: str
     quantity: int
@@ -135,6 +170,43 @@ class UpdateOrderStatusRequest(BaseModel):
     shippingGuide: str
 
 
+class ShipmentUpdate(BaseModel):
+    order_id: str
+    shippingGuide: str
+
+
+class BulkShipRequest(BaseModel):
+    shipments: List[ShipmentUpdate]
+
+
+class ShipmentResult(BaseModel):
+    order_id: str
+    status: str
+    email_queued: bool
+
+
+class BulkShipResponse(BaseModel):
+    shipped: int
+    not_found: int
+    results: List[ShipmentResult]
+
+
+class StatusStats(BaseModel):
+    status: str
+    order_count: int
+    total_amount: float
+
+
+class DailyStats(BaseModel):
+    day: date
+    status: str
+    order_count: int
+    total_amount: float
+
+
 class StatsResponse(BaseModel):
     total_users: int
     total_order_amount: float
+    total_orders: Optional[int] = None
+    by_status: Optional[List[StatusStats]] = None
+    daily: Optional[List[DailyStats]] = None
@@ -0,0 +1,247 @@
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple
+
+import httpx
+from prometheus_client import REGISTRY, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from config import settings
+
+try:
+    # Optional: spans are only recorded when an OpenTelemetry SDK is installed
+    # and configured; with the bare API they are no-ops.
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+tracer = (
+    trace.get_tracer("amazonBackend") if trace and settings.metrics_tracing else None
+)
+
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "API request latency",
+    ["method", "route", "status"],
+)
+HTTP_RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes",
+    "API response body size",
+    ["method", "route"],
+    buckets=SIZE_BUCKETS,
+)
+DEPENDENCY_DURATION = Histogram(
+    "dependency_request_duration_seconds",
+    "Latency of calls to upstream services",
+    ["dependency", "operation", "outcome"],
+)
+DEPENDENCY_PAYLOAD_SIZE = Histogram(
+    "dependency_payload_size_bytes",
+    "Size of payloads exchanged with upstream services",
+    ["dependency", "direction"],
+    buckets=SIZE_BUCKETS,
+)
+
+# Path segments longer than a version tag ("v1") that contain digits are ids,
+# dates or tokens; collapsing them keeps the operation label low-cardinality.
+_ID_SEGMENT = re.compile(r"/(?=[^/]*\d)[^/]{3,}")
+
+
+def operation_name(request: httpx.Request) -> str:
+    return f"{request.method} {_ID_SEGMENT.sub('/:id', request.url.path) or '/'}"
+
+
+def outcome(status_code: Optional[int]) -> str:
+    if status_code is None:
+        return "error"
+    return f"{status_code // 100}xx"
+
+
+def start_span(name: str, attributes: dict):
+    if tracer is None:
+        return None
+    return tracer.start_span(name, attributes=attributes)
+
+
+def end_span(span, status_code: Optional[int] = None, error: Exception = None):
+    if span is None:
+        return
+    if status_code is not None:
+        span.set_attribute("http.response.status_code", status_code)
+    if error is not None:
+        span.record_exception(error)
+        span.set_status(trace.Status(trace.StatusCode.ERROR))
+    span.end()
+
+
+@asynccontextmanager
+async def track(dependency: str, operation: str):
+    span = start_span(
+        f"{dependency} {operation}",
+        {"peer.service": dependency, "operation": operation},
+    )
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        DEPENDENCY_DURATION.labels(dependency, operation, "error").observe(
+            time.perf_counter() - started
+        )
+        end_span(span, error=e)
+        raise
+    DEPENDENCY_DURATION.labels(dependency, operation, "ok").observe(
+        time.perf_counter() - started
+    )
+    end_span(span)
+
+
+class _CountingStream(httpx.AsyncByteStream):
+    def __init__(self, stream: httpx.AsyncByteStream, on_close):
+        self._stream = stream
+        self._on_close = on_close
+        self.size = 0
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            self.size += len(chunk)
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._on_close(self.size)
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport: httpx.AsyncBaseTransport, dependency: str):
+        self.transport = transport
+        self.dependency = dependency
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        operation = operation_name(request)
+        span = start_span(
+            f"{self.dependency} {operation}",
+            {
+                "peer.service": self.dependency,
+                "http.request.method": request.method,
+                "server.address": request.url.host,
+            },
+        )
+        request_size = int(request.headers.get("content-length", 0))
+        DEPENDENCY_PAYLOAD_SIZE.labels(self.dependency, "request").observe(request_size)
+        started = time.perf_counter()
+        try:
+            response = await self.transport.handle_async_request(request)
+        except Exception as e:
+            DEPENDENCY_DURATION.labels(self.dependency, operation, "error").observe(
+                time.perf_counter() - started
+            )
+            end_span(span, error=e)
+            raise
+
+        def on_close(size: int):
+            # Latency includes reading the body, which is when the caller
+            # actually has the data.
+            DEPENDENCY_DURATION.labels(
+                self.dependency, operation, outcome(response.status_code)
+            ).observe(time.perf_counter() - started)
+            DEPENDENCY_PAYLOAD_SIZE.labels(self.dependency, "response").observe(size)
+            end_span(span, response.status_code)
+
+        response.stream = _CountingStream(response.stream, on_close)
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+def instrumented_transport(dependency: str, **kwargs) -> InstrumentedTransport:
+    return InstrumentedTransport(httpx.AsyncHTTPTransport(**kwargs), dependency)
+
+
+async def metrics_middleware(request, call_next):
+    span = start_span(
+        f"{request.method} {request.url.path}",
+        {"http.request.method": request.method},
+    )
+    started = time.perf_counter()
+    response = None
+    try:
+        if span is not None:
+            with trace.use_span(span, end_on_exit=False):
+                response = await call_next(request)
+        else:
+            response = await call_next(request)
+        return response
+    finally:
+        # The route template, not the raw path, so ids do not become labels.
+        route = request.scope.get("route")
+        route = route.path if route is not None else "unmatched"
+        status_code = response.status_code if response is not None else 500
+        HTTP_REQUEST_DURATION.labels(request.method, route, status_code).observe(
+            time.perf_counter() - started
+        )
+        size = response.headers.get("content-length") if response else None
+        if size:
+            HTTP_RESPONSE_SIZE.labels(request.method, route).observe(int(size))
+        if span is not None:
+            span.update_name(f"{request.method} {route}")
+            end_span(span, status_code)
+
+
+# Exposes the stats() dicts the app already keeps as Prometheus metrics. The
+# /metrics endpoint refreshes the snapshot right before each scrape.
+class StatsCollector:
+    def __init__(self):
+        self.caches: Dict[str, dict] = {}
+        self.flights: Dict[str, dict] = {}
+        self.counters: Dict[str, Tuple[str, Dict[str, float]]] = {}
+
+    def update(self, caches: dict, flights: dict, counters: dict):
+        self.caches = {name: stats for name, stats in caches.items() if stats}
+        self.flights = flights
+        self.counters = counters
+
+    def collect(self):
+        lookups = CounterMetricFamily(
+            "cache_lookups", "Cache lookups by result", labels=["cache", "result"]
+        )
+        refreshes = CounterMetricFamily(
+            "cache_refreshes", "Background cache refreshes", labels=["cache"]
+        )
+        size = GaugeMetricFamily("cache_size_bytes", "Cache size", labels=["cache"])
+        evictions = CounterMetricFamily(
+            "cache_evictions", "Cache evictions", labels=["cache"]
+        )
+        for name, stats in self.caches.items():
+            for result in ("hits", "stale_hits", "misses"):
+                lookups.add_metric([name, result], stats.get(result, 0))
+            refreshes.add_metric([name], stats.get("refreshes", 0))
+            if stats.get("bytes") is not None:
+                size.add_metric([name], stats["bytes"])
+            evictions.add_metric([name], stats.get("evictions", 0))
+
+        calls = CounterMetricFamily(
+            "singleflight_calls", "Calls that ran", labels=["flight"]
+        )
+        coalesced = CounterMetricFamily(
+            "singleflight_coalesced", "Callers that joined a call", labels=["flight"]
+        )
+        for name, stats in self.flights.items():
+            calls.add_metric([name], stats["calls"])
+            coalesced.add_metric([name], stats["coalesced"])
+
+        yield from (lookups, refreshes, size, evictions, calls, coalesced)
+        for name, (documentation, values) in self.counters.items():
+            family = CounterMetricFamily(name, documentation, labels=["kind"])
+            for kind, value in values.items():
+                family.add_metric([kind], value)
+            yield family
+
+
+stats_collector = StatsCollector()
+REGISTRY.register(stats_collector)
@@ -0,0 +1,53 @@
+import gzip
+import re
+from typing import Optional
+
+import brotli
+import orjson
+from fastapi.responses import Response
+
+# Below this the compressed body is barely smaller and not worth the CPU.
+MIN_COMPRESS_SIZE = 1024
+
+_QZERO = re.compile(r"q=0(\.0{0,3})?")
+
+
+class LeanJSONResponse(Response):
+    media_type = "application/json"
+
+    # Content must already be plain dicts/lists; nothing is validated.
+    # OPT_UTC_Z writes UTC datetimes with a "Z" suffix, as pydantic does.
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+
+
+def accepted_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.partition(";")
+        # "gzip;q=0" means the client refuses gzip.
+        if _QZERO.fullmatch(params.replace(" ", "")):
+            continue
+        accepted.add(name.strip().lower())
+    if "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compressed_json(
+    content, accept_encoding: Optional[str], headers: Optional[dict] = None
+) -> Response:
+    body = orjson.dumps(content, option=orjson.OPT_UTC_Z)
+    headers = {**(headers or {}), "Vary": "Accept-Encoding"}
+    encoding = (
+        accepted_encoding(accept_encoding) if len(body) >= MIN_COMPRESS_SIZE else None
+    )
+    if encoding == "br":
+        body = brotli.compress(body, quality=5)
+    elif encoding == "gzip":
+        body = gzip.compress(body, compresslevel=6)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(body, media_type="application/json", headers=headers)
@@ -0,0 +1,10 @@
+import unicodedata
+
+
+def fold_text(text: str) -> str:
+    # Accents are stripped but "ñ" is kept, since in Spanish it changes the
+    # word ("año" vs "ano").
+    text = unicodedata.normalize("NFC", text).casefold().replace("ñ", "\0")
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.replace("\0", "ñ").split())